@@ -28,6 +28,8 @@ base_dir     = '.'
 locale_dir   = os.path.join(MODULE_DIR, "locale/")
 icons_dir    = os.path.join(MODULE_DIR, "icons/")
 plugins_dirs = os.path.join(MODULE_DIR, "plugins/")
+#: render diagrams with OpenGL (large flows)
+opengl       = False
 
 
 def build_exec_cmd(flow, loglevel, userargs={}):
@@ -1,20 +1,36 @@
 #!/usr/bin/python
 # -*- coding: utf8 -*-
 
+import io
 import logging
-import copy
-import codecs
-import threading
-from xml.dom.minidom import Document, parseString
+import os
+from array import array
+import queue
+import shutil
 import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from xml.sax.saxutils import quoteattr
+try:
+    from lxml import etree as ElementTree
+except ImportError:
+    from xml.etree import ElementTree
 from gettext import gettext as _
 
 import florun
-from .utils import empty, atoi, import_plugins
+from .utils import atoi, import_plugins
 
 
 logger = logging.getLogger(__name__)
 
+#: buffer size for files I/O
+BUFFER_SIZE = 1 << 16
+
+_plugins_loaded = False
+
+#: L{Node} subclasses by full name, filled on class creation
+_NODE_REGISTRY = {}
+
 
 class FlowError(Exception):
     pass
@@ -37,6 +53,31 @@ class IncompatibilityError(FlowError):
         self.interface2 = interface2
 
 
+def load_plugins():
+    """
+    Imports all plugins available in ``florun.plugins_dirs``, only once.
+    Their node classes are then available through L{findNodeClass}.
+    """
+    global _plugins_loaded
+    if not _plugins_loaded:
+        import_plugins(florun.plugins_dirs, globals())
+        _plugins_loaded = True
+
+
+def findNodeClass(classname):
+    """
+    Find node class from its full name (see L{Node.fullname}).
+    Names of classes of this module may be given without module.
+    @type classname : string
+    @rtype : class
+    """
+    classobj = _NODE_REGISTRY.get(classname) or \
+               _NODE_REGISTRY.get("%s.%s" % (__name__, classname))
+    if classobj is None:
+        raise FlowParsingError(_(u"Unknown node type '%s'") % classname)
+    return classobj
+
+
 class Flow(object):
     """
     Represents a work-flow, in which each L{Node} executes operations.
@@ -46,9 +87,31 @@ class Flow(object):
         self.modified = False
         self.filename = None
         self._nodes = []
+        #: index of nodes by id
+        self._nodes_by_id = {}
+        #: queue of nodes ready to run, set by L{Runner}
+        self.readyqueue = None
+        #: topological index of nodes, kept up to date on each new connector
+        self._order = {}
+        self._nextorder = 0
+        #: ordered set of nodes without predecessors
+        self._start_nodes = {}
+        #: adjacency arrays, see L{_materializeCsr}
+        self._csr = None
 
     def clone(self):
-        return copy.copy(self)
+        """
+        Shallow copy : nodes are shared, not the containers indexing them.
+        @rtype: L{Flow}
+        """
+        flow = Flow.__new__(Flow)
+        flow.__dict__.update(self.__dict__)
+        flow._nodes = list(self._nodes)
+        flow._nodes_by_id = dict(self._nodes_by_id)
+        flow._order = dict(self._order)
+        flow._start_nodes = dict(self._start_nodes)
+        flow._csr = None
+        return flow
 
     @property
     def nodes(self):
@@ -57,10 +120,15 @@ class Flow(object):
     @nodes.setter
     def nodes(self, nodes):
         self._nodes = nodes
+        self._nodes_by_id = {}
+        self._order = {}
+        self._start_nodes = {}
+        for n in nodes:
+            self._indexNode(n)
 
     @property
     def startNodes(self):
-        return [n for n in self.nodes if empty(n.predecessors)]
+        return list(self._start_nodes)
 
     @property
     def inputNodes(self):
@@ -76,7 +144,7 @@ class Flow(object):
         @type end   : {Interface}
         """
         self.modified = True
-        if end in start.successors or start in end.successors:
+        if end in start.successors:
             raise FlowError(_("Connector already exists from %s to %s") % (start, end))
         start.addSuccessor(end)
 
@@ -95,6 +163,63 @@ class Flow(object):
         self.modified = True
         node.flow = self
         self.nodes.append(node)
+        self._indexNode(node)
+
+    def _indexNode(self, node):
+        """
+        Register node in id index and give it the last topological index.
+        """
+        self._nodes_by_id[node.id] = node
+        self._order[node] = self._nextorder
+        self._nextorder += 1
+        self._connectorsChanged(node)
+        # Already connected to nodes of this flow
+        for successor in node.successors:
+            self._reorder(node, successor)
+
+    def _reorder(self, start, end):
+        """
+        Maintain topological order when a connector from node ``start`` to
+        node ``end`` is added (Pearce-Kelly algorithm) : only nodes whose
+        index lies between those of ``end`` and ``start`` are renumbered.
+        Raises L{FlowError} if the connector would create a cycle.
+        @type start : L{Node}
+        @type end   : L{Node}
+        """
+        order = self._order
+        if start not in order or end not in order:
+            return
+        lower, upper = order[end], order[start]
+        if lower > upper:
+            return  # Already sorted
+        forward = self._affectedNodes(end, lambda n: n.successors,
+                                      lambda i: i <= upper)
+        if start in forward:
+            raise FlowError(_("Connector from %s to %s would create a cycle.") % (start, end))
+        backward = self._affectedNodes(start, lambda n: n.predecessors,
+                                       lambda i: i >= lower)
+        # Predecessors of start are moved before successors of end, reusing their indices
+        nodes = sorted(backward, key=order.get) + sorted(forward, key=order.get)
+        indices = sorted(order[n] for n in nodes)
+        for n, i in zip(nodes, indices):
+            order[n] = i
+
+    def _affectedNodes(self, node, relatives, inbounds):
+        """
+        Depth-first search from ``node`` restricted to nodes whose
+        topological index is in bounds.
+        @rtype: list of L{Node}
+        """
+        order = self._order
+        visited = set([node])
+        stack = [node]
+        while stack:
+            n = stack.pop()
+            for r in relatives(n):
+                if r not in visited and r in order and inbounds(order[r]):
+                    visited.add(r)
+                    stack.append(r)
+        return list(visited)
 
     def removeConnector(self, start, end):
         """
@@ -111,9 +236,9 @@ class Flow(object):
         self.modified = True
         # Remove all connectors
         for interface in node.interfaces:
-            for relative in interface.successors:
+            for relative in list(interface.successors):
                 self.removeConnector(interface, relative)
-            for relative in interface.predecessors:
+            for relative in list(interface.predecessors):
                 self.removeConnector(relative, interface)
         node.flow = None
         # Remove the node itself
@@ -121,6 +246,34 @@ class Flow(object):
             self.nodes.remove(node)
         except ValueError:
             raise FlowError(_("Node not found in flow."))
+        if self._nodes_by_id.get(node.id) is node:
+            del self._nodes_by_id[node.id]
+        self._order.pop(node, None)
+        self._start_nodes.pop(node, None)
+        self._csr = None
+
+    def _connectorsChanged(self, node):
+        """
+        Keep start nodes and adjacency arrays up to date when connectors of node change.
+        """
+        self._csr = None
+        if node in self._order:
+            if node.predecessors:
+                self._start_nodes.pop(node, None)
+            else:
+                self._start_nodes[node] = None
+
+    def _renameNode(self, node, nodeid):
+        """
+        Keep nodes index up to date when a node id changes.
+        Raises L{FlowError} if another node already has this id.
+        """
+        other = self._nodes_by_id.get(nodeid)
+        if other is not None and other is not node:
+            raise FlowError(_("A node with id '%s' already exists.") % nodeid)
+        if self._nodes_by_id.get(node.id) is node:
+            del self._nodes_by_id[node.id]
+            self._nodes_by_id[nodeid] = node
 
     def randomId(self, node):
         """
@@ -129,7 +282,7 @@ class Flow(object):
         """
         nodeid = "%s" % node.label
         i = 2
-        while nodeid in [n.id for n in self.nodes]:
+        while nodeid in self._nodes_by_id:
             nodeid = "%s-%s" % (node.label, i)
             i = i + 1
         return nodeid
@@ -139,10 +292,10 @@ class Flow(object):
         Find node by its id
         @rtype: L{Node}
         """
-        for n in self.nodes:
-            if n.id == nodeid:
-                return n
-        raise NodeNotFoundError(_("Node with id '%s' not found.") % nodeid)
+        try:
+            return self._nodes_by_id[nodeid]
+        except KeyError:
+            raise NodeNotFoundError(_("Node with id '%s' not found.") % nodeid)
 
     @staticmethod
     def load(filename):
@@ -151,10 +304,8 @@ class Flow(object):
         @rtype : L{Flow}
         """
         logger.info(_("Load flow from file '%s'") % filename)
-        fd = open(filename)
-        content = fd.read()
-        fd.close()
-        f = Flow.importXml(content)
+        with open(filename, 'rb', buffering=BUFFER_SIZE) as fd:
+            f = Flow.parseXml(fd)
         f.filename = filename
         f.modified = False
         f.sortNodesByIncidence()
@@ -165,27 +316,58 @@ class Flow(object):
             filename = self.filename
         # Update incidence field and sort
         self.sortNodesByIncidence()
-        xml = self.exportXml()
         logger.info(_("Save flow to file '%s'") % filename)
-        fd = open(filename, 'w')
-        fd.write(xml)
-        fd.close()
+        # Existing file is only replaced once the whole flow was written
+        fd = tempfile.NamedTemporaryFile('wb', buffering=BUFFER_SIZE, delete=False,
+                                         dir=os.path.dirname(os.path.abspath(filename)))
+        try:
+            with fd:
+                fd.write(b"<?xml version='1.0' encoding='utf-8'?>\n")
+                fd.writelines(part.encode('utf-8') for part in self._xmlParts())
+            if os.path.exists(filename):
+                shutil.copymode(filename, fd.name)
+            os.replace(fd.name, filename)
+        except Exception:
+            os.unlink(fd.name)
+            raise
         self.modified = False
 
     def sortNodesByIncidence(self):
         """
-        Recursively sets a incidence number for each node,
-        depending on its position within the flow.
+        Sets a incidence number for each node, depending on its position
+        within the flow : 1 for start nodes, one more than the highest of
+        its predecessors otherwise.
         Sort nodes on this index.
         """
-        def setincidence(nodelist, level):
-            for n in nodelist:
-                n.incidence = level
-                if len(n.successors) > 0:
-                    setincidence(n.successors, level + 1)
-        setincidence(self.startNodes, 1)
-        self.nodes.sort(key=lambda x: x.id)
-        self.nodes.sort(key=lambda x: x.incidence)
+        nodes, indptr, indices = self._materializeCsr()
+        incidence = array('i', [1]) * len(nodes)
+        # In topological order, predecessors are always visited first
+        for i in range(len(nodes)):
+            level = incidence[i] + 1
+            for j in indices[indptr[i]:indptr[i + 1]]:
+                if incidence[j] < level:
+                    incidence[j] = level
+        for n, level in zip(nodes, incidence):
+            n.incidence = level
+        self.nodes.sort(key=lambda x: (x.incidence, x.id))
+
+    def _materializeCsr(self):
+        """
+        Compressed adjacency of nodes, in topological order : successors
+        of the i-th node are at positions ``indices[indptr[i]:indptr[i + 1]]``.
+        Rebuilt only when connectors or nodes changed.
+        @rtype: tuple (list of L{Node}, array, array)
+        """
+        if self._csr is None:
+            nodes = sorted(self.nodes, key=self._order.get)
+            positions = dict((n, i) for i, n in enumerate(nodes))
+            indptr = array('i', [0])
+            indices = array('i')
+            for n in nodes:
+                indices.extend(positions[s] for s in n.successors if s in positions)
+                indptr.append(len(indices))
+            self._csr = (nodes, indptr, indices)
+        return self._csr
 
     @classmethod
     def importXml(cls, xmlcontent):
@@ -193,52 +375,68 @@ class Flow(object):
         @type xmlcontent: string
         @rtype: L{Flow}
         """
-        flow = Flow()
-        dom = parseString(xmlcontent)
+        if not isinstance(xmlcontent, bytes):
+            xmlcontent = xmlcontent.encode('utf-8')
+        return cls.parseXml(io.BytesIO(xmlcontent))
 
-        import_plugins(florun.plugins_dirs, globals())
-        
-        for xmlnode in dom.getElementsByTagName('node'):
-            nodeid    = xmlnode.getAttribute('id')
-            classname = xmlnode.getAttribute('type')
+    @classmethod
+    def parseXml(cls, source):
+        """
+        Build a flow while streaming the XML, each node element being
+        released once loaded.
+        @param source: file object
+        @rtype: L{Flow}
+        """
+        flow = Flow()
+        links = []
+
+        load_plugins()
+        addNode = flow.addNode
+        addLink = links.append
+
+        for event, xmlnode in ElementTree.iterparse(source, events=('end',)):
+            if xmlnode.tag != 'node':
+                continue
+            get = xmlnode.get
+            nodeid    = get('id')
+            classname = get('type')
             logger.debug(_(u"XML node type %(classname)s with id '%(nodeid)s'") % locals())
 
             # Dynamic instanciation of node type
-            try:
-                classobj = eval(classname)
-            except:
-                raise FlowParsingError(_(u"Unknown node type '%s'") % classname)
+            classobj = findNodeClass(classname)
 
             node = classobj(flow=flow, id=nodeid)
 
             # Load graphical attributes
-            for prop in xmlnode.getElementsByTagName('graphproperty'):
-                name  = prop.getAttribute('name')
-                value = atoi(prop.getAttribute('value'))
+            graphicalprops = node.graphicalprops
+            for prop in xmlnode.iterfind('graphproperty'):
+                name  = prop.get('name')
+                value = atoi(prop.get('value'))
                 logger.debug(_(u"XML node property : %s = %s") % (name, value))
-                node.graphicalprops[name] = value
-            flow.addNode(node)
+                graphicalprops[name] = value
+            addNode(node)
 
-        # Once all nodes have been loaded, load links :
-        for xmlnode in dom.getElementsByTagName('node'):
-            nodeid = xmlnode.getAttribute('id')
-            node   = flow.findNode(nodeid)
-            for xmlinterface in xmlnode.getElementsByTagName('interface'):
-                name = xmlinterface.getAttribute('name')
-                src  = node.findInterface(name)
+            findInterface = node.findInterface
+            for xmlinterface in xmlnode.iterfind('interface'):
+                iget = xmlinterface.get
+                src  = findInterface(iget('name'))
                 src.slot = True
                 if src.isInput() and src.isValue():
-                    src.slot = xmlinterface.getAttribute('slot').lower() == 'true'
+                    src.slot = iget('slot', '').lower() == 'true'
                     if not src.slot:
-                        src.value = xmlinterface.getAttribute('value')
-                for xmlsuccessor in xmlinterface.getElementsByTagName('successor'):
-                    dnodeid = xmlsuccessor.getAttribute('node')
-                    dnode   = flow.findNode(dnodeid)
-                    # Find interface on destination node
-                    dname = xmlsuccessor.getAttribute('interface')
-                    dest  = dnode.findInterface(dname)
-                    dest.slot = True
-                    src.addSuccessor(dest)
+                        src.value = iget('value', '')
+                # Destination node may not be loaded yet
+                for xmlsuccessor in xmlinterface.iterfind('successor'):
+                    addLink((src, xmlsuccessor.get('node'), xmlsuccessor.get('interface')))
+            xmlnode.clear()
+
+        # Once all nodes have been loaded, load links :
+        findNode = flow.findNode
+        for src, dnodeid, dname in links:
+            # Find interface on destination node
+            dest  = findNode(dnodeid).findInterface(dname)
+            dest.slot = True
+            src.addSuccessor(dest)
         flow.sortNodesByIncidence()
         return flow
 
@@ -246,45 +444,47 @@ class Flow(object):
         """
         @rtype: string
         """
-        # Document root
-        grxml = Document()
-        grxmlr = grxml.createElement('flow')
-        grxml.appendChild(grxmlr)
+        return u"".join(self._xmlParts())
+
+    def _xmlParts(self):
+        """
+        Generates the XML document piece by piece, from templates.
+        @rtype: iterator of string
+        """
+        quote = quoteattr
+        yield u"<flow>\n"
         # Each node...
         for node in self.nodes:
-            xmlnode = grxml.createElement('node')
-            xmlnode.setAttribute('id', str(node.id))
-            xmlnode.setAttribute('type', str(node.fullname()))
-            grxmlr.appendChild(xmlnode)
+            yield u"\t<node id=%s type=%s>\n" % (quote(str(node.id)),
+                                                quote(str(node.fullname())))
 
             # Graphical properties
-            if not empty(node.graphicalprops):
-                for graphprop in node.graphicalprops:
-                    prop = grxml.createElement('graphproperty')
-                    prop.setAttribute('name', graphprop)
-                    prop.setAttribute('value', "%s" % node.graphicalprops[graphprop])
-                    xmlnode.appendChild(prop)
+            for graphprop, value in node.graphicalprops.items():
+                yield u"\t\t<graphproperty name=%s value=%s />\n" % \
+                      (quote(graphprop), quote("%s" % value))
 
             # Interfaces and successors
             for interface in node.interfaces:
-                xmlinterface = grxml.createElement('interface')
-                xmlinterface.setAttribute('name', interface.name)
+                attrs = u"name=%s" % quote(interface.name)
                 if interface.isInput() and interface.isValue():
-                    xmlinterface.setAttribute('slot', "%s" % interface.slot)
-                    if not interface.slot:
-                        val = ''
-                        if interface.value is not None:
-                            val = interface.value
-                        xmlinterface.setAttribute('value', "%s" % val)
-                if not empty(interface.successors):
-                    for successor in interface.successors:
-                        xmlsuccessor = grxml.createElement('successor')
-                        xmlsuccessor.setAttribute('node', successor.node.id)
-                        xmlsuccessor.setAttribute('interface', successor.name)
-                        xmlinterface.appendChild(xmlsuccessor)
-                xmlnode.appendChild(xmlinterface)
-
-        return grxml.toprettyxml()
+                    slot = interface.slot
+                    attrs += u" slot=%s" % quote("%s" % slot)
+                    if not slot:
+                        val = interface.value
+                        if val is None:
+                            val = ''
+                        attrs += u" value=%s" % quote("%s" % val)
+                successors = interface.successors
+                if not successors:
+                    yield u"\t\t<interface %s />\n" % attrs
+                    continue
+                yield u"\t\t<interface %s>\n" % attrs
+                for successor in successors:
+                    yield u"\t\t\t<successor node=%s interface=%s />\n" % \
+                          (quote(successor.node.id), quote(successor.name))
+                yield u"\t\t</interface>\n"
+            yield u"\t</node>\n"
+        yield u"</flow>\n"
 
 
 class Interface(object):
@@ -292,6 +492,8 @@ class Interface(object):
     Interfaces allow two L{Node}s to be connected.
     """
     PARAMETER, INPUT, RESULT, OUTPUT = range(4)
+    #: guards readiness bookkeeping, notified from runner threads
+    _readylock = threading.Lock()
 
     def __init__(self, node, name, **kwargs):
         """
@@ -301,10 +503,10 @@ class Interface(object):
         self.node = node
         self.name = name
 
-        #: list of {Interface}
-        self.successors = []
-        #: list of {Interface}
-        self.predecessors = []
+        #: ordered set of {Interface} (dict with None values)
+        self.successors = {}
+        #: ordered set of {Interface} (dict with None values)
+        self.predecessors = {}
 
         self.type    = kwargs.get('type', self.PARAMETER)
         self.slot    = kwargs.get('slot', True)
@@ -312,7 +514,9 @@ class Interface(object):
         self.value   = kwargs.get('value', self.default)
         self.doc     = kwargs.get('doc', '')
 
-        self.__readypredecessors = {}
+        #: predecessors whose content is ready, loaded all at once
+        self._pending_loads = []
+        node._registerInterface(self)
 
     def isValue(self):
         return False
@@ -341,19 +545,24 @@ class Interface(object):
         """
         if not interface.isCompatible(self):
             raise IncompatibilityError(interface, self)
-        self.successors.append(interface)
-        interface.predecessors.append(self)
-        logger.debug(_("%s has following successors : %s") % (self, self.successors))
+        if self.node.flow is not None:
+            self.node.flow._reorder(self.node, interface.node)
+        self.successors[interface] = None
+        interface.predecessors[self] = None
+        self.node._connectorsChanged()
+        interface.node._connectorsChanged()
+        logger.debug(_("%s has following successors : %s") % (self, list(self.successors)))
 
     def removeSuccessor(self, interface):
         """
         @type interface : L{Interface}
         """
-        try:
-            self.successors.remove(interface)
-            interface.predecessors.remove(self)
-        except ValueError:
+        if interface not in self.successors:
             raise FlowError(_("Connector does not exist from %s to %s") % (self, interface))
+        del self.successors[interface]
+        del interface.predecessors[self]
+        self.node._connectorsChanged()
+        interface.node._connectorsChanged()
 
     def load(self, other):
         """
@@ -364,11 +573,21 @@ class Interface(object):
             raise FlowError(_("Should not load interface that is not connected."))
         # Did nothing.
 
+    def loadAll(self, others):
+        """
+        Load content of several predecessors, in order.
+        Subclasses may override it to merge them in a single pass.
+        @type others : list of {Interface}
+        """
+        for other in others:
+            self.load(other)
+
     def clean(self):
         """
         Method to clean and free this interface.
         """
-        pass
+        # Next run will notify readiness again
+        del self._pending_loads[:]
 
     def onContentReady(self, interface):
         """
@@ -376,11 +595,17 @@ class Interface(object):
         interface is ready. Notify node.
         @type interface: interface whose content is ready.
         """
-        self.load(interface)
-        self.__readypredecessors[interface] = True
-        if len(self.__readypredecessors.keys()) >= len(self.predecessors):
-            self.node.debug("All predecessors of %s are ready." % self.fullname)
-            self.node.onInterfaceReady(self)
+        with self._readylock:
+            pending = self._pending_loads
+            if interface in pending:
+                return
+            pending.append(interface)
+            if len(pending) != len(self.predecessors):
+                return
+        self.node.debug("All predecessors of %s are ready." % self.fullname)
+        # In connectors order, whatever order they were notified in
+        self.loadAll(list(self.predecessors))
+        self.node.onInterfaceReady(self)
 
     @property
     def fullname(self):
@@ -416,22 +641,51 @@ class Node(object):
     label       = _(u"")
     description = _(u"")
 
+    #: Interfaces instantiated for each node,
+    #: list of (attribute, L{Interface} subclass, name, keyword arguments)
+    _interface_specs = ()
+    _fullname = "%s.Node" % __name__
+
+    def __init_subclass__(cls, **kwargs):
+        super(Node, cls).__init_subclass__(**kwargs)
+        cls._fullname = "%s.%s" % (cls.__module__, cls.__name__)
+        cls._interface_specs = tuple(cls._interface_specs)
+        _NODE_REGISTRY[cls._fullname] = cls
+
     def __init__(self, *args, **kwargs):
         self.flow = kwargs.get('flow', None)
-        self.id = kwargs.get('id', '')
-        if not self.id and self.flow:
-            self.id = self.flow.randomId(self)
-        self._interfaces = []
+        self._id = kwargs.get('id', '')
+        if not self._id and self.flow:
+            self._id = self.flow.randomId(self)
+        #: list of L{Interface}, registered on creation
+        self.interfaces  = []
+        self._inputinterfaces  = []
+        self._outputinterfaces = []
         self.incidence   = 0
         self.graphicalprops = {}
 
-        self.__readyinterfaces = {}
-        self.canRun  = threading.Event()
+        self.__readyinterfaces = set()
         self.running = False
+        # Cache of successors and predecessors nodes
+        self._successors   = None
+        self._predecessors = None
+
+        for attr, interfaceclass, name, options in self._interface_specs:
+            setattr(self, attr, interfaceclass(self, name, **options))
+
+    @property
+    def id(self):
+        return self._id
+
+    @id.setter
+    def id(self, nodeid):
+        if self.flow is not None:
+            self.flow._renameNode(self, nodeid)
+        self._id = nodeid
 
     @classmethod
     def fullname(cls):
-        return "%s.%s" % (cls.__module__, cls.__name__)
+        return cls._fullname
 
     def applyAttributes(self, entries):
         """
@@ -469,53 +723,57 @@ class Node(object):
         """
         return self.__class__.__name__
 
-    @property
-    def interfaces(self):
+    def _registerInterface(self, interface):
         """
-        Dynamically list class attributes that are Interfaces.
-        @rtype : list of L{Interface}
+        Called by L{Interface} constructor.
+        @type interface : L{Interface}
         """
-        if len(self._interfaces) == 0:
-            for attr in self.__dict__.values():
-                if issubclass(attr.__class__, Interface):
-                    self._interfaces.append(attr)
-        return self._interfaces
+        self.interfaces.append(interface)
+        if interface.isInput():
+            self._inputinterfaces.append(interface)
+        else:
+            self._outputinterfaces.append(interface)
 
     @property
     def inputInterfaces(self):
-        return [i for i in self.interfaces if i.isInput()]
+        return self._inputinterfaces
 
     @property
     def inputSlotInterfaces(self):
-        return [i for i in self.inputInterfaces if i.slot]
+        return [i for i in self._inputinterfaces if i.slot]
 
     @property
     def outputInterfaces(self):
-        return [i for i in self.interfaces if not i.isInput()]
+        return self._outputinterfaces
 
     @property
     def successors(self):
         """
         @rtype: list of L{Node}
         """
-        successors = []
-        for interface in self.interfaces:
-            for successor in interface.successors:
-                if successor.node not in successors:
-                    successors.append(successor.node)
-        return successors
+        if self._successors is None:
+            self._successors = list(dict.fromkeys(successor.node for interface in self.interfaces
+                                                                 for successor in interface.successors))
+        return self._successors
 
     @property
     def predecessors(self):
         """
         @rtype: list of L{Node}
         """
-        predecessors = []
-        for interface in self.interfaces:
-            for predecessor in interface.predecessors:
-                if predecessor.node not in predecessors:
-                    predecessors.append(predecessor.node)
-        return predecessors
+        if self._predecessors is None:
+            self._predecessors = list(dict.fromkeys(predecessor.node for interface in self.interfaces
+                                                                     for predecessor in interface.predecessors))
+        return self._predecessors
+
+    def _connectorsChanged(self):
+        """
+        Called by L{Interface} when a connector is added or removed.
+        """
+        self._successors   = None
+        self._predecessors = None
+        if self.flow is not None:
+            self.flow._connectorsChanged(self)
 
     def findInterface(self, name):
         """
@@ -533,11 +791,12 @@ class Node(object):
         When all are ready, execution starts.
         @type interface : L{Interface}
         """
-        self.__readyinterfaces[interface] = True
-        if len(self.__readyinterfaces.keys()) >= len(self.inputSlotInterfaces):
+        self.__readyinterfaces.add(interface)
+        if len(self.__readyinterfaces) >= len(self.inputSlotInterfaces):
             # Node has all its input interfaces ready
             self.debug("All interfaces are ready, can start.")
-            self.canRun.set()
+            if self.flow is not None and self.flow.readyqueue is not None:
+                self.flow.readyqueue.put(self)
 
     def run(self):
         """
@@ -553,11 +812,9 @@ class Node(object):
 
     def start(self):
         """
-        Start execution of node.
+        Start execution of node, once all its input interfaces are ready.
         When done, notify successors of this node.
         """
-        self.debug(_("Waiting..."))
-        self.canRun.wait()
         self.debug(_("Start !"))
         self.running = True
 
@@ -568,13 +825,13 @@ class Node(object):
             self.exception(e)
 
         self.running = False
-        self.canRun.clear()
         for i in self.outputInterfaces:
             for interface in i.successors:
                 self.debug(_("Notify %s") % interface)
                 interface.onContentReady(i)
 
     def clean(self):
+        self.__readyinterfaces.clear()
         for i in self.interfaces:
             i.clean()
 
@@ -637,14 +894,27 @@ class InterfaceStream(Interface):
 
     def __init__(self, node, name, **kwargs):
         Interface.__init__(self, node, name, **kwargs)
-        self.stream = tempfile.NamedTemporaryFile('w+b')
+        # Created on first use : inputs usually read their predecessor's file.
+        self._stream = None
+
+    @property
+    def stream(self):
+        if self._stream is None:
+            self._stream = tempfile.NamedTemporaryFile('w+b', buffering=BUFFER_SIZE)
+        return self._stream
+
+    @stream.setter
+    def stream(self, stream):
+        self._stream = stream
 
     def __iter__(self):
         return iter(self.stream)
 
     def clean(self):
         Interface.clean(self)
-        self.stream.close()
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
 
     def write(self, data):
         self.stream.write(data)
@@ -659,21 +929,39 @@ class InterfaceStream(Interface):
             return super(InterfaceStream, self).isCompatible(other)
         return False
 
+    def loadAll(self, others):
+        if len(others) == 1:
+            self.load(others[0])
+            return
+        # Concatenate all predecessors content into our own file
+        ftell = self.stream.tell()
+        for other in others:
+            if issubclass(other.__class__, InterfaceStream):
+                Interface.load(self, other)
+                other.flush()
+                with open(other.stream.name, 'rb', buffering=BUFFER_SIZE) as source:
+                    shutil.copyfileobj(source, self.stream, BUFFER_SIZE)
+            else:
+                self.load(other)
+                self.stream.seek(0, io.SEEK_END)
+        self.stream.seek(ftell)
+
     def load(self, other):
         Interface.load(self, other)
         if issubclass(other.__class__, InterfaceStream):
-            #self.stream = copy.copy(other.stream)
-            self.stream = codecs.open(other.stream.name, 'rb', 'utf-8')
-            #self.stream.seek(0)
+            # Make sure all content was written before reading it
+            other.flush()
+            # Raw bytes : consumers decode if they need text
+            self.stream = open(other.stream.name, 'rb', buffering=BUFFER_SIZE)
         elif issubclass(other.__class__, InterfaceValue):
             self.node.debug(_("Write InterfaceValue to InterfaceStream"))
             ftell = self.stream.tell()
-            self.stream.write(u"%s\n" % other.value)
+            self.stream.write((u"%s\n" % other.value).encode('utf-8'))
             self.stream.seek(ftell)
         elif issubclass(other.__class__, InterfaceList):
             ftell = self.stream.tell()
             self.node.debug(_("Write InterfaceList to InterfaceStream"))
-            self.stream.write(u"\n".join(other.items))
+            self.stream.writelines((u"%s\n" % item).encode('utf-8') for item in other.items)
             self.stream.seek(ftell)
         else:
             raise IncompatibilityError(self, other)
@@ -695,7 +983,7 @@ class InterfaceList(Interface):
 
     def load(self, other):
         Interface.load(self, other)
-        self.items = copy.copy(other.items)
+        self.items = list(other.items)
 
 
 class ProcessNode(Node):
@@ -717,10 +1005,10 @@ class ValueInputNode(InputNode):
     label       = _(u"Value")
     description = _(u"A string or number")
 
-    def __init__(self, *args, **kwargs):
-        InputNode.__init__(self, *args, **kwargs)
-        self.input  = InterfaceValue(self, 'value', default='', type=Interface.PARAMETER, slot=False, doc="Manual value")
-        self.output = InterfaceValue(self, 'out', default='',   type=Interface.OUTPUT, doc="value")
+    _interface_specs = [
+        ('input',  InterfaceValue, 'value', dict(default='', type=Interface.PARAMETER, slot=False, doc="Manual value")),
+        ('output', InterfaceValue, 'out',   dict(default='', type=Interface.OUTPUT, doc="value")),
+    ]
 
     def run(self):
         self.output.value = self.input.value
@@ -731,45 +1019,53 @@ class ValueInputNode(InputNode):
 #
 
 
-class NodeRunner(threading.Thread):
-
-    def __init__(self, node):
-        threading.Thread.__init__(self)
-        self.node = node
-
-    def run(self):
-        self.node.start()
-
-    def stop(self):
-        pass
-
-
 class Runner(object):
+    """
+    Runs the nodes of a flow on a pool of threads, each node being
+    submitted as soon as all its input interfaces are ready.
+    """
+    MAX_WORKERS = 32
 
     def __init__(self, flow):
         self.flow = flow
-        self.threads = []
+        self.executor = None
 
     def start(self):
         logger.info(_("Start execution of flow..."))
-        for node in self.flow.nodes:
-            th = NodeRunner(node)
-            self.threads.append(th)
-            th.start()
-        # Release semaphores
-        logger.debug(_("All node instantiated, waiting for their input interfaces to be ready."))
+        nodes = self.flow.nodes
+        ready = queue.Queue()
+        self.flow.readyqueue = ready
         for node in self.flow.startNodes:
-            node.canRun.set()
-        # Wait the end
-        logger.debug(_("All input node started. Wait for each node to finish."))
-        for th in self.threads:
-            th.join()
-        # Clean-up
-        for n in self.flow.nodes:
-            n.clean()
+            ready.put(node)
+        scheduled = set()
+        pending = set()
+        self.executor = ThreadPoolExecutor(max_workers=max(1, min(self.MAX_WORKERS, len(nodes))))
+        try:
+            while True:
+                # Submit nodes notified as ready by their predecessors
+                while not ready.empty():
+                    node = ready.get()
+                    if node not in scheduled:
+                        scheduled.add(node)
+                        pending.add(self.executor.submit(node.start))
+                if not pending:
+                    break
+                # A node enqueues its successors before its future is done
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+        finally:
+            self.executor.shutdown()
+            self.flow.readyqueue = None
+            # Clean-up, even if a node failed
+            for n in nodes:
+                n.clean()
+        for node in nodes:
+            if node not in scheduled:
+                node.warning(_("Never started, input interfaces were not all ready."))
         # Done.
         logger.info(_("Done."))
 
     def stop(self):
-        for th in self.threads:
-            th.stop()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
@@ -4,31 +4,41 @@
 import os
 import errno
 import sys
-import copy
 import math
+import codecs
+import functools
+import threading
 import logging
 import tempfile
 
 from PyQt5.QtCore import *
-from PyQt5.QtGui import QIcon, QTransform, QDrag, QPainter, QColor, QFont, QPen, QPixmap, QCursor, QPolygonF, QImage, qRgba
+from PyQt5.QtGui import QIcon, QTransform, QDrag, QPainter, QColor, QBrush, QFont, QPen, QPixmap, QPixmapCache, QCursor, QPolygonF, QImage, qRgba, \
+                        QTextCharFormat, QTextCursor
 from PyQt5.QtWidgets import QDesktopWidget, QApplication, QMainWindow, QDialogButtonBox, \
                          QDialog, QFileDialog, QAction, QStyle, QWidget, QFrame, \
-                         QLabel, QTabWidget, QLineEdit, QTextEdit, QPushButton, QToolBox, \
+                         QLabel, QTabWidget, QLineEdit, QPlainTextEdit, QPushButton, QToolBox, \
                          QGroupBox, QCheckBox, QComboBox, QSplitter, QMessageBox, \
                          QGridLayout, QVBoxLayout, QHBoxLayout, QFormLayout, \
                          QGraphicsScene, QGraphicsView, QGraphicsItem, \
                          QGraphicsItemGroup, QGraphicsEllipseItem, QGraphicsTextItem, QGraphicsLineItem, \
                          QGraphicsPolygonItem
                          
-from PyQt5.QtSvg  import QGraphicsSvgItem
+from PyQt5.QtSvg  import QGraphicsSvgItem, QSvgRenderer
 
 import florun
 from florun.flow  import *
-from florun.utils import import_plugins, itersubclasses, groupby, empty, traceback2str
+from florun.utils import import_plugins, itersubclasses, groupby, traceback2str, PNGWriter
 
 
 logger = logging.getLogger(__name__)
 
+# Shared drawing tools, see SlotItem and DiagramConnector
+PEN_HIGHLIGHT = QPen(Qt.darkMagenta, 3)
+PEN_CONNECTED = QPen(Qt.darkMagenta, 2)
+PEN_IDLE      = QPen(Qt.darkGray, 2)
+PEN_CONNECTOR = QPen(Qt.darkMagenta, 3, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin)
+BRUSH_CONNECTOR = QBrush(Qt.darkMagenta)
+
 
 """
     
@@ -45,7 +55,12 @@ class SlotItem(QGraphicsEllipseItem):
     COLORS = {InterfaceValue  : QColor(255, 255, 64),
               InterfaceStream : QColor(255, 159, 64),
               InterfaceList   : QColor(159, 255, 64)}
+    BRUSHES = dict((iclass, QBrush(icolor)) for iclass, icolor in COLORS.items())
+    #: resolved brushes, by interface class
+    _brushes = {}
     TEXT_LEFT, TEXT_RIGHT, TEXT_BOTTOM, TEXT_TOP = range(4)
+    #: fonts need an application, created on first slot
+    _font = None
 
     def __init__(self, parent, interface, textposition=None):
         """
@@ -54,7 +69,7 @@ class SlotItem(QGraphicsEllipseItem):
         @param textpostition : L{SlotItem.TEXT_LEFT}, ... L{SlotItem.TEXT_TOP}
         """
         QGraphicsEllipseItem.__init__(self, parent)
-        assert issubclass(parent.__class__, DiagramItem)
+        assert isinstance(parent, DiagramItem)
         self.parent = parent
         self.connectors = []
         # Underlying object
@@ -68,23 +83,38 @@ class SlotItem(QGraphicsEllipseItem):
 
     def buildItem(self):
         self.setToolTip(self.interface.doc)
-        color = list(self.COLORS.values())[0]
-        for iclass, icolor in self.COLORS.items():
-            if issubclass(self.interface.__class__, iclass):
-                color = icolor
-        self.setBrush(color)
+        self.setBrush(self.interfaceBrush(self.interface.__class__))
         self.setZValue(self.parent.zValue() + 1)
+        # Appearance only changes with highlight (setPen repaints)
+        self.setCacheMode(QGraphicsItem.DeviceCoordinateCache)
         self.text = QGraphicsTextItem(self)
         self.text.setParentItem(self)
-        f = QFont()
-        f.setPointSize(6)
-        self.text.setFont(f)
+        self.text.setCacheMode(QGraphicsItem.DeviceCoordinateCache)
+        if SlotItem._font is None:
+            SlotItem._font = QFont()
+            SlotItem._font.setPointSize(6)
+        self.text.setFont(SlotItem._font)
+
+    @classmethod
+    def interfaceBrush(cls, interfaceclass):
+        """
+        @type interfaceclass : class
+        @rtype: L{QBrush}
+        """
+        brush = SlotItem._brushes.get(interfaceclass)
+        if brush is None:
+            brush = list(cls.BRUSHES.values())[0]
+            for iclass, ibrush in cls.BRUSHES.items():
+                if issubclass(interfaceclass, iclass):
+                    brush = ibrush
+            SlotItem._brushes[interfaceclass] = brush
+        return brush
 
     def setPos(self, pos):
         #QGraphicsEllipseItem.setPos(self, pos)
+        # setRect() already schedules a repaint
         self.setRect(pos.x(), pos.y(), self.SIZE, self.SIZE)
         self.text.setPos(pos + self.textOffset())
-        self.update()
 
     @property
     def label(self):
@@ -98,12 +128,12 @@ class SlotItem(QGraphicsEllipseItem):
     def highlight(self, state):
         self._highlight = state
         if state:
-            self.setPen(QPen(Qt.darkMagenta, 3))
+            self.setPen(PEN_HIGHLIGHT)
         else:
             if len(self.connectors) == 0:
-                self.setPen(QPen(Qt.darkGray, 2))
+                self.setPen(PEN_IDLE)
             else:
-                self.setPen(QPen(Qt.darkMagenta, 2))
+                self.setPen(PEN_CONNECTED)
 
     def connect(self, connector, start=True):
         if start:
@@ -143,24 +173,26 @@ class DiagramConnector(QGraphicsLineItem):
     A {DiagramConnector} is a visual representation of an {flow.Interface}s successor.
     """
     HEAD_SIZE = 10
+    #: arrow head shape, shared by all connectors
+    ARROW_POLYGON = QPolygonF([QPointF(-HEAD_SIZE / 2, -HEAD_SIZE - 3),
+                               QPointF( HEAD_SIZE / 2, -HEAD_SIZE - 3),
+                               QPointF(0, -3)])
 
     def __init__(self, *args):
         QGraphicsLineItem.__init__(self, *args)
         self.startItem = None
         self.endItem   = None
 
-        pen = QPen(Qt.darkMagenta, 3, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin)
-
         self.setAcceptHoverEvents(True)
         self.setZValue(-1000)
-        self.setPen(pen)
+        self.setPen(PEN_CONNECTOR)
 
-        polyhead = QPolygonF([QPointF(-self.HEAD_SIZE / 2, -self.HEAD_SIZE - 3),
-                              QPointF( self.HEAD_SIZE / 2, -self.HEAD_SIZE - 3),
-                              QPointF(0, -3)])
-        self.arrowhead = QGraphicsPolygonItem(polyhead, self)
-        self.arrowhead.setPen(pen)
-        self.arrowhead.setBrush(Qt.darkMagenta)
+        self.arrowhead = QGraphicsPolygonItem(self.ARROW_POLYGON, self)
+        self.arrowhead.setPen(PEN_CONNECTOR)
+        self.arrowhead.setBrush(BRUSH_CONNECTOR)
+        self.arrowhead.setCacheMode(QGraphicsItem.DeviceCoordinateCache)
+        #: arrow head rotation, reused on each move
+        self._rotation = QTransform()
 
     def __unicode__(self):
         return u"%s - %s" % (self.startItem, self.endItem)
@@ -181,21 +213,55 @@ class DiagramConnector(QGraphicsLineItem):
         endpos = self.line().p2()
         self.setLine(QLineF(pos, endpos))
 
+    def moveOriginFast(self, pos):
+        """
+        Move origin, end being known to stay still.
+        Unlike L{moveOrigin}, arrow head is rotated too.
+        """
+        self.setLine(QLineF(pos, self.line().p2()))
+        self.rotateHead()
+
+    def moveEndFast(self, pos):
+        """
+        Move end, origin being known to stay still.
+        """
+        self.moveEnd(pos)
+
     def moveEnd(self, pos):
         oripos = self.line().p1()
         self.setLine(QLineF(oripos, pos))
-        # Rotate arrow head
         self.arrowhead.setPos(pos)
-        l = self.line().length() or 1
-        # Compute angle of arrow
-        angle = math.acos(self.line().dx() / l) - math.pi / 2
-        if self.line().dy() < 0:
-            angle = math.pi - angle
+        self.rotateHead()
+
+    def rotateHead(self):
+        """
+        Orient arrow head along the line.
+        """
+        line = self.line()
+        dx, dy = line.dx(), line.dy()
+        # Compute angle of arrow (kept upright while connector has no length)
+        angle = math.atan2(dy, dx) - math.pi / 2 if dx or dy else 0
         # Apply transformation to arrow head
-        rotation = QTransform(math.cos(angle), math.sin(angle),
-                             -math.sin(angle), math.cos(angle), 0, 0)
+        rotation = self._rotation
+        rotation.reset()
+        rotation.rotateRadians(angle)
         self.arrowhead.setTransform(rotation)
 
+    def isExposed(self, rect, pos, origin=True):
+        """
+        Whether connector lies in rect, before or after moving one end.
+        @type rect : L{QRectF}
+        @param pos : new position of moving end
+        @param origin : whether the moving end is the origin
+        """
+        if self.sceneBoundingRect().intersects(rect):
+            return True
+        line = self.line()
+        fixed = line.p2() if origin else line.p1()
+        margin = self.HEAD_SIZE
+        moved = QRectF(fixed, pos).normalized().adjusted(-margin, -margin, margin, margin)
+        return moved.intersects(rect)
+
     def updatePosition(self):
         offset = QPointF(SlotItem.SIZE / 2, SlotItem.SIZE / 2)
         oripos = QPointF()
@@ -212,10 +278,7 @@ class DiagramConnector(QGraphicsLineItem):
 
     def hoverEnterEvent(self, event):
         # Do not consider hovering connector, if over slot.
-        hoverSlot = False
-        for i in self.scene().items(event.scenePos()):
-            if issubclass(i.__class__, SlotItem):
-                hoverSlot = True
+        hoverSlot = any(isinstance(i, SlotItem) for i in self.scene().items(event.scenePos()))
         if not hoverSlot:
             self.scene().connectorEnterEvent.emit(self)
         QGraphicsLineItem.hoverEnterEvent(self, event)
@@ -230,8 +293,21 @@ class DiagramItem(QGraphicsItemGroup):
     A {DiagramItem} is the graphical representation of a {flow.Node}.
     """
     SVG_SHAPE = ''
+    #: slots text position, which also gives their side, by interface type
+    TEXT_POSITIONS = {Interface.PARAMETER : SlotItem.TEXT_RIGHT,
+                      Interface.INPUT     : SlotItem.TEXT_BOTTOM,
+                      Interface.RESULT    : SlotItem.TEXT_LEFT,
+                      Interface.OUTPUT    : SlotItem.TEXT_TOP}
 
     mappings = {}
+    #: resolved L{factory} matches, by node class
+    _factories = {}
+    #: SVG renderers shared by all items, by file path
+    _renderers = {}
+    #: resolved SVG file paths, by class
+    _svgpaths = {}
+    #: fonts need an application, created on first item
+    _font = None
     
     def __init__(self, *args):
         QGraphicsItemGroup.__init__(self, *args)
@@ -239,11 +315,20 @@ class DiagramItem(QGraphicsItemGroup):
         self.setFlag(QGraphicsItem.ItemIsMovable, True)
         self.setFlag(QGraphicsItem.ItemIsSelectable, True)
         self.setFlag(QGraphicsItem.ItemSendsGeometryChanges, True)
+        # Children do all the painting, except the selection outline
+        self.setFlag(QGraphicsItem.ItemHasNoContents, True)
         self._shapes = None
         self.text = None
+        #: item and text rects text was last laid out for
+        self._textlayout = None
         # Underlying object
         self._node = None
         self.slotitems = []
+        #: slots of each side, by text position
+        self._sides = dict((p, []) for p in (SlotItem.TEXT_LEFT, SlotItem.TEXT_RIGHT,
+                                             SlotItem.TEXT_BOTTOM, SlotItem.TEXT_TOP))
+        self._visibleslots = set()
+        self._slotsbyinterface = {}
         #: cf DiagramItem::showSlot() and DiagramScene::itemSelected()
         self.hackselected = False
         self.buildItem()
@@ -259,26 +344,44 @@ class DiagramItem(QGraphicsItemGroup):
     def node(self, node):
         self._node = node
         self.addSlots()
-        self.showSlots()
+        # Show id and slots
+        self.update()
 
     @staticmethod
     def register(nodeclass, diagramitemclass):
         DiagramItem.mappings[nodeclass] = diagramitemclass
+        DiagramItem._factories.clear()
 
     @staticmethod
     def factory(classobj):
+        diagramitemcls = DiagramItem._factories.get(classobj)
+        if diagramitemcls is None:
+            diagramitemcls = DiagramItem._findItemClass(classobj)
+            DiagramItem._factories[classobj] = diagramitemcls
+        return diagramitemcls()
+
+    @staticmethod
+    def _findItemClass(classobj):
         # Find direct match first
-        for mainclass, diagramitemcls in DiagramItem.mappings.items():
-            if classobj == mainclass:
-                return diagramitemcls()
+        diagramitemcls = DiagramItem.mappings.get(classobj)
+        if diagramitemcls is not None:
+            return diagramitemcls
         # Find by inheritance
         for mainclass, diagramitemcls in DiagramItem.mappings.items():
             if issubclass(classobj, mainclass):
-                return diagramitemcls()
+                return diagramitemcls
         raise Exception(_("Unknown node type '%s'") % classobj.__name__)
 
     @classmethod
     def SVGShape(cls):
+        path = DiagramItem._svgpaths.get(cls)
+        if path is None:
+            path = cls._findSVGShape()
+            DiagramItem._svgpaths[cls] = path
+        return path
+
+    @classmethod
+    def _findSVGShape(cls):
         path = os.path.join(florun.icons_dir, cls.SVG_SHAPE)
         if not os.path.exists(path):
             for plugindir in florun.plugins_dirs.split(os.pathsep):
@@ -288,11 +391,25 @@ class DiagramItem(QGraphicsItemGroup):
             logger.warning("SVG missing '%s'" % path)
         return path
 
+    @classmethod
+    def SVGRenderer(cls):
+        """
+        The SVG file is parsed once, its renderer is then shared.
+        @rtype: L{QSvgRenderer}
+        """
+        path = cls.SVGShape()
+        renderer = DiagramItem._renderers.get(path)
+        if renderer is None:
+            renderer = QSvgRenderer(path)
+            DiagramItem._renderers[path] = renderer
+        return renderer
+
     def buildItem(self):
         self.text = QGraphicsTextItem()
-        f = QFont()
-        f.setBold(True)
-        self.text.setFont(f)
+        if DiagramItem._font is None:
+            DiagramItem._font = QFont()
+            DiagramItem._font.setBold(True)
+        self.text.setFont(DiagramItem._font)
         self.text.setZValue(1000)
         self.addToGroup(self.text)
         for s in self.shapes.values():
@@ -304,26 +421,36 @@ class DiagramItem(QGraphicsItemGroup):
         if not self._shapes:
             self._shapes = {}
             for elt in ['start', '']:
-                s = QGraphicsSvgItem(self.SVGShape())
+                s = QGraphicsSvgItem()
+                s.setSharedRenderer(self.SVGRenderer())
                 if elt:
                     s.setElementId(elt)
+                # Blit a pixmap instead of rendering SVG on each repaint
+                s.setCacheMode(QGraphicsItem.DeviceCoordinateCache)
                 self._shapes[elt] = s
             self.shapes['start'].setZValue(self.shapes[''].zValue() - 1)
         return self._shapes
 
     def update(self):
         # Update id
-        if self.node is not None:
+        if self.node is not None and self.node.id != self.text.toPlainText():
             self.text.setPlainText(self.node.id)
-        # Center text item
         itemrect = self.boundingRect()
         textrect = self.text.boundingRect()
+        # Text layout is left as is if neither text nor item changed
+        key = (itemrect.getRect(), textrect.getRect())
+        if key != self._textlayout:
+            self._layoutText(itemrect, textrect)
+            self._textlayout = key
+        # Show slots
+        self.showSlots()
+
+    def _layoutText(self, itemrect, textrect):
+        # Center text item
         self.text.setPos(QPointF(itemrect.x() + itemrect.width() / 2 - textrect.width() / 2,
                                 -textrect.height() + itemrect.y() + itemrect.height() / 2))
         if textrect.width() > itemrect.width():
             self.text.setTextWidth(itemrect.width())
-        # Show slots
-        self.showSlots()
 
     def setStartNode(self, state):
         self.shapes['start'].setVisible(state)
@@ -333,11 +460,28 @@ class DiagramItem(QGraphicsItemGroup):
         # Selection state
         if change == QGraphicsItem.ItemSelectedChange:
             self.scene().selectedChanged.emit(self)
+        if change == QGraphicsItem.ItemSelectedHasChanged:
+            self.setFlag(QGraphicsItem.ItemHasNoContents, not value)
         # Position
         if change == QGraphicsItem.ItemPositionChange:
+            # Slots scene positions are shifted by the move, and the
+            # other end of each connector belongs to another item.
+            offset = QPointF(SlotItem.SIZE / 2, SlotItem.SIZE / 2) + value - self.pos()
+            scene = self.scene()
+            # Connectors out of view are only updated once dragging is over
+            exposed = scene.dragRect if scene is not None else None
             for s in self.slotitems:
+                if not s.connectors:
+                    continue
+                pos = s.sceneBoundingRect().topLeft() + offset
                 for c in s.connectors:
-                    c.updatePosition()
+                    origin = c.startItem is s
+                    if exposed is not None and not c.isExposed(exposed, pos, origin):
+                        scene.deferConnector(c)
+                    elif origin:
+                        c.moveOriginFast(pos)
+                    else:
+                        c.moveEndFast(pos)
         return r
 
     def findSlot(self, interface):
@@ -346,27 +490,32 @@ class DiagramItem(QGraphicsItemGroup):
         @type interface: {flow.Interface}
         @rtype: {SlotItem}
         """
-        for s in self.slotitems:
-            if s.interface == interface:
-                return s
+        slot = self._slotsbyinterface.get(interface)
+        if slot is not None:
+            return slot
         raise Exception(u"SlotItem with interface %s not found on %s" % (interface, self))
 
     def addSlots(self):
         # Add them all
-        textpositions = {Interface.PARAMETER : SlotItem.TEXT_RIGHT,
-                         Interface.INPUT     : SlotItem.TEXT_BOTTOM,
-                         Interface.RESULT    : SlotItem.TEXT_LEFT,
-                         Interface.OUTPUT    : SlotItem.TEXT_TOP}
         for interface in self.node.interfaces:
-            textposition = textpositions.get(interface.type, None)
+            textposition = self.TEXT_POSITIONS.get(interface.type, None)
             slot = SlotItem(self, interface, textposition)
             slot.setVisible(False)
             self.slotitems.append(slot)
+            self._slotsbyinterface[interface] = slot
+            self._sides[slot.textposition].append(slot)
             self.addToGroup(slot)
 
     def showSlots(self):
+        # Save selected state, restore after
+        self.hackselected = True
+        selected = self.isSelected()
         for slot in self.slotitems:
-            self.showSlot(slot, slot.interface.slot)
+            self._setSlotVisible(slot, slot.interface.slot)
+        self._layoutAllSlots()
+        # Reset selected state that was lost
+        self.setSelected(selected)
+        self.hackselected = False
 
     def boundingOffsets(self):
         """
@@ -382,56 +531,66 @@ class DiagramItem(QGraphicsItemGroup):
         # Save selected state, restore after
         self.hackselected = True
         selected = self.isSelected()
+        self._setSlotVisible(slot, state)
+        self._layoutSide(slot.textposition, self.boundingRect(), self.boundingOffsets())
+        # Reset selected state that was lost
+        self.setSelected(selected)
+        self.hackselected = False
+
+    def _setSlotVisible(self, slot, state):
         # Show/Hide slot
         slot.setVisible(state)
-
-        # Disconnect all connectors
-        if not state:
-            for c in slot.connectors:
+        if state:
+            self._visibleslots.add(slot)
+        else:
+            self._visibleslots.discard(slot)
+            # Disconnect all connectors
+            for c in slot.connectors[:]:
                 self.scene().removeConnector(c, True)
 
-        # Spread on side
+    def _layoutAllSlots(self):
+        """
+        Spread visible slots on all sides
+        """
         rect = self.boundingRect()
+        offsets = self.boundingOffsets()
+        for textposition in self._sides:
+            self._layoutSide(textposition, rect, offsets)
 
-        # List all visible slot on each side
-        left   = [s for s in self.slotitems if s.textposition == SlotItem.TEXT_RIGHT  and s.isVisible()]
-        right  = [s for s in self.slotitems if s.textposition == SlotItem.TEXT_LEFT   and s.isVisible()]
-        top    = [s for s in self.slotitems if s.textposition == SlotItem.TEXT_BOTTOM and s.isVisible()]
-        bottom = [s for s in self.slotitems if s.textposition == SlotItem.TEXT_TOP    and s.isVisible()]
+    def _layoutSide(self, textposition, rect, offsets):
+        """
+        Spread visible slots along the side given by their text position
+        @param offsets : see L{boundingOffsets}
+        """
+        # List all visible slot on this side
+        sidelist = [s for s in self._sides[textposition] if s in self._visibleslots]
+        if not sidelist:
+            return
 
         # Find out positions intervals and offsets
-        offtop, offright, offbottom, offleft = self.boundingOffsets()
+        offtop, offright, offbottom, offleft = offsets
         # slot's textposition allows to know on which side slot appears
-        # sidelist    : which list of slots to be handled
         # corner      : which point of reference to spread along side
         # sizex,sizey : which size of refence to spread along side
-        if slot.textposition == SlotItem.TEXT_RIGHT:
-            sidelist = left
+        if textposition == SlotItem.TEXT_RIGHT:
             corner = QPointF(rect.x() + offleft, rect.y())
             sizex, sizey = (0, rect.height())
-        elif slot.textposition == SlotItem.TEXT_LEFT:
-            sidelist = right
+        elif textposition == SlotItem.TEXT_LEFT:
             corner = QPointF(rect.x() + rect.width() + offright, rect.y())
             sizex, sizey = (0, rect.height())
-        elif slot.textposition == SlotItem.TEXT_BOTTOM:
-            sidelist = top
+        elif textposition == SlotItem.TEXT_BOTTOM:
             corner = QPointF(rect.x(), rect.y() + offtop)
             sizex, sizey = (rect.width(), 0)
-        elif slot.textposition == SlotItem.TEXT_TOP:
-            sidelist = bottom
+        elif textposition == SlotItem.TEXT_TOP:
             corner = QPointF(rect.x(), rect.y() + rect.height() + offbottom)
             sizex, sizey = (rect.width(), 0)
 
         intervalx = sizex / (len(sidelist) + 1)
         intervaly = sizey / (len(sidelist) + 1)
-        offset = QPointF(-SlotItem.SIZE / 2, -SlotItem.SIZE / 2)
+        corner += QPointF(-SlotItem.SIZE / 2, -SlotItem.SIZE / 2)
 
-        for j, s in enumerate(sidelist):
-            position = corner + offset + QPointF(intervalx * (j + 1), intervaly * (j + 1))
-            s.setPos(position)
-        # Reset selected state that was lost
-        self.setSelected(selected)
-        self.hackselected = False
+        for j, s in enumerate(sidelist, 1):
+            s.setPos(corner + QPointF(intervalx * j, intervaly * j))
 
 
 class DiagramItemProcess(DiagramItem):
@@ -481,6 +640,9 @@ class DiagramScene(QGraphicsScene):
     
     def __init__(self, *args, **kwargs):
         super(DiagramScene, self).__init__(*args, **kwargs)
+        # Items move all the time and spatial queries are few : BSP tree
+        # maintenance would cost more than linear lookups.
+        self.setItemIndexMethod(QGraphicsScene.NoIndex)
         self.setSceneRect(QRectF(QPointF(), self.DEFAULT_SIZE))
         self.slotEnterEvent.connect(self._slotEnterEvent)
         self.slotLeaveEvent.connect(self._slotLeaveEvent)
@@ -491,6 +653,13 @@ class DiagramScene(QGraphicsScene):
         self.slot = None
         self.connectorHover = None
         self.slotHover = None
+        #: all {DiagramConnector}s of the scene
+        self._connectors = set()
+        #: all {DiagramItem}s of the scene, by node
+        self._by_node = {}
+        #: visible scene area while dragging, see L{deferConnector}
+        self.dragRect = None
+        self._deferred = set()
         #self.itemSelected = None
 
     @property
@@ -519,7 +688,7 @@ class DiagramScene(QGraphicsScene):
         print('dropEvent')
         # Create graphical item from string (classname)
         classname = str(event.mimeData().text())
-        classobj = eval(classname)
+        classobj = findNodeClass(classname)
         node = classobj(flow=self.parent().flow)
         self.addDiagramItem(event.scenePos(), node)
 
@@ -548,22 +717,24 @@ class DiagramScene(QGraphicsScene):
         middle = pos - item.sceneBoundingRect().center()
         item.setPos(middle)
         self.addItem(item)
-        item.update()
+        self._by_node[node] = item
         if emit:
             self.diagramItemCreated.emit(item)
         return item
 
     def removeDiagramItem(self, item):
         for slot in item.slotitems:
-            toremove = copy.copy(slot.connectors)
+            toremove = slot.connectors[:]
             for connector in toremove:
                 self.removeConnector(connector)
         self.removeItem(item)
+        self._by_node.pop(item.node, None)
         self.diagramItemRemoved.emit(item)
 
     def addConnector(self, startSlot, endSlot=None, emit=True):
         connector = DiagramConnector()
         self.addItem(connector)
+        self._connectors.add(connector)
         startSlot.connect(connector, start=True)
         # If endSlot is not given, then the user is now drawing
         if endSlot is not None:
@@ -574,24 +745,39 @@ class DiagramScene(QGraphicsScene):
         connector.updatePosition()
         return connector
 
+    def deferConnector(self, connector):
+        """
+        Postpone update of a connector position until mouse is released
+        @type connector : L{DiagramConnector}
+        """
+        self._deferred.add(connector)
+
     def removeConnector(self, connector, event=False):
         logger.debug("Disconnect {}".format(connector))
         connector.disconnect()
         self.removeItem(connector)
+        self._connectors.discard(connector)
+        self._deferred.discard(connector)
         self._connectorLeaveEvent(connector)
         if event:
             logger.debug("Connector removed : {}".format(connector))
             self.connectorRemoved.emit(connector)
 
+    def clear(self):
+        QGraphicsScene.clear(self)
+        self._connectors.clear()
+        self._by_node.clear()
+        self._deferred.clear()
+
     @property
     def diagramitems(self):
-        return [i for i in self.items() if issubclass(i.__class__, DiagramItem)]
+        return list(self._by_node.values())
 
     def findDiagramItemByNode(self, node):
-        for i in self.diagramitems:
-            if i.node == node:
-                return i
-        raise Exception("%s : %s" % ("DiagramItem not found with node", node))
+        try:
+            return self._by_node[node]
+        except KeyError:
+            raise Exception("%s : %s" % ("DiagramItem not found with node", node))
 
     def setStartNodes(self, nodes):
         for i in self.diagramitems:
@@ -603,6 +789,9 @@ class DiagramScene(QGraphicsScene):
     def mousePressEvent(self, mouseEvent):
         if self.slot is not None:
             self.connector = self.addConnector(self.slot)
+        view = self.view
+        if view is not None:
+            self.dragRect = view.mapToScene(view.viewport().rect()).boundingRect()
         QGraphicsScene.mousePressEvent(self, mouseEvent)
 
     def mouseMoveEvent(self, mouseEvent):
@@ -616,8 +805,9 @@ class DiagramScene(QGraphicsScene):
         # Check if mouse left or entered a slot
         hoverslot = None
         for i in self.items(pos):
-            if issubclass(i.__class__, SlotItem):
+            if isinstance(i, SlotItem):
                 hoverslot = i
+                break
         # Left
         if hoverslot is None and self.slotHover is not None:
             self.slotLeaveEvent.emit(self.slotHover)
@@ -639,10 +829,9 @@ class DiagramScene(QGraphicsScene):
             if self.slot is not None:
                 if self.connector.canConnect(self.slot):
                     # Check if connector already exists
-                    exists = False
-                    for i in [item for item in self.items() if issubclass(item.__class__, DiagramConnector)]:
-                        if i.startItem == self.connector.startItem and i.endItem == self.slot:
-                            exists = True
+                    startItem = self.connector.startItem
+                    exists = any(c.startItem is startItem and c.endItem is self.slot
+                                 for c in self._connectors)
                     if not exists:
                         # New connector, remove the one being drawn
                         self.removeConnector(self.connector)
@@ -661,12 +850,17 @@ class DiagramScene(QGraphicsScene):
         # Moved item ?
         pos = mouseEvent.scenePos()
         for i in self.items(pos):
-            if issubclass(i.__class__, DiagramItem):
+            if isinstance(i, DiagramItem):
                 self.diagramItemMoved.emit(i)
         # Reinitialize situation
         self.connector = None
         self.slot = None
         QGraphicsScene.mouseReleaseEvent(self, mouseEvent)
+        # Catch up with connectors that were out of view
+        self.dragRect = None
+        for connector in self._deferred:
+            connector.updatePosition()
+        self._deferred.clear()
 
     def itemSelected(self, item):
         # Due to DiagramItem::showSlot() l.350 auto deselect  !
@@ -728,12 +922,20 @@ class NodeLibrary(QToolBox):
 
 class LibraryItem(QFrame):
 
+    ICON_WIDTH = 50
+
     def __init__(self, id, label, iconfile):
         QFrame.__init__(self)
         self.id = id
-        # An Icon and a label below
+        self.nodeclass = findNodeClass(id)
+        # An Icon and a label below, icons being decoded and scaled once
+        key = "%s@%s" % (iconfile, self.ICON_WIDTH)
+        pixmap = QPixmapCache.find(key)
+        if pixmap is None:
+            pixmap = QPixmap(iconfile).scaledToWidth(self.ICON_WIDTH, Qt.SmoothTransformation)
+            QPixmapCache.insert(key, pixmap)
         icon = QLabel()
-        icon.setPixmap(QPixmap(iconfile).scaledToWidth(50))
+        icon.setPixmap(pixmap)
         layout = QGridLayout()
         layout.addWidget(icon, 0, 0, Qt.AlignHCenter)
         title = QLabel(label)
@@ -749,7 +951,7 @@ class LibraryItem(QFrame):
     def window(self):
         if self._window is None:
             widget = self.parent()
-            while widget is not None and not issubclass(widget.__class__, MainWindow):
+            while widget is not None and not isinstance(widget, MainWindow):
                 widget = widget.parent()
             self._window = widget
         return self._window
@@ -762,7 +964,7 @@ class LibraryItem(QFrame):
         self.setFrameStyle(QFrame.Panel | QFrame.Sunken)
         self.setCursor(Qt.OpenHandCursor)
         # Show description in status bar
-        self.window.setStatusMessage(eval(self.id).description)
+        self.window.setStatusMessage(self.nodeclass.description)
 
     def leaveEvent(self, event):
         self.setFrameStyle(QFrame.NoFrame)
@@ -808,10 +1010,6 @@ class ParameterField(QWidget):
         @type interface : L{flow.Interface}
         """
         QWidget.__init__(self, *args)
-        self.interface = interface
-
-        self.label = interface.name
-
         self.edit     = QLineEdit(self)
         self.checkbox = QCheckBox('slot', self)
         self.checkbox.setToolTip('Use slot input')
@@ -820,20 +1018,34 @@ class ParameterField(QWidget):
         layout.addWidget(self.edit)
         layout.addWidget(self.checkbox)
         self.setLayout(layout)
+        self.setInterface(interface)
+
+    def setInterface(self, interface):
+        """
+        Reflect another interface.
+        @type interface : L{flow.Interface}
+        """
+        self.interface = interface
+        self.label = interface.name
         self.setToolTip(interface.doc)
         # Show slot as it should be
         self.setSlot(self.interface.slot)
 
     def setSlot(self, slotstate):
         """
-        Show slot checkbox as specified by slotstate
+        Show slot checkbox as specified by slotstate.
+        This is not an user edition : no signal is emitted.
         """
+        editblocked = self.edit.blockSignals(True)
+        checkblocked = self.checkbox.blockSignals(True)
         self.checkbox.setCheckState(Qt.Checked if slotstate else Qt.Unchecked)
         self.edit.setEnabled(not slotstate)
         value = ''
         if self.interface.value is not None and not slotstate:
             value = self.interface.value
         self.edit.setText(value)
+        self.edit.blockSignals(editblocked)
+        self.checkbox.blockSignals(checkblocked)
 
     @property
     def checked(self):
@@ -892,13 +1104,20 @@ class ParametersEditor(QWidget):
 
         self.setLayout(mainlayout)
 
-        # Form item
-        self.formwidget = None
-        self.formlayout = None
+        # Form item, built once and reused for every item
+        self.nodeId = QLineEdit('', self)
+        self.nodeId.textChanged.connect(self.entriesChanged)
+        self.nodeId.returnPressed.connect(self.save)
+        self.formlayout = QFormLayout()
+        self.formlayout.addRow("Id", self.nodeId)
+        self.formwidget = QWidget()
+        self.formwidget.setLayout(self.formlayout)
+        self.paramlayout.insertWidget(0, self.formwidget)
         """@type item : {DiagramItem}"""
         self.item       = None
-        self.nodeId     = None
         self.extrafields = {}
+        #: (label, {ParameterField}) by node class and interface name, see L{field}
+        self._fields = {}
         self.changed    = False
 
         # Init form with default fields
@@ -925,22 +1144,17 @@ class ParametersEditor(QWidget):
                 # Clear loaded item, Update it on scene
                 self.item.update()
 
-        # Now clear the panel, and reinitialize widgets
-        if self.formwidget is not None:
-            self.paramlayout.removeWidget(self.formwidget)
-            self.formwidget.setParent(None)
+        # Now clear the panel, rows are only hidden and kept for next items
+        for w in self.extrafields.values():
+            self.formlayout.labelForField(w).hide()
+            w.hide()
 
         # Common fields
         self.lbldescription.setText('')
         self.informationbox.setTitle("Node")
-
-        self.nodeId = QLineEdit('', self)
-        self.formlayout = QFormLayout()
-        self.formlayout.addRow("Id", self.nodeId)
-
-        self.formwidget = QWidget()
-        self.formwidget.setLayout(self.formlayout)
-        self.paramlayout.insertWidget(0, self.formwidget)
+        blocked = self.nodeId.blockSignals(True)
+        self.nodeId.setText('')
+        self.nodeId.blockSignals(blocked)
 
         self.item = None
         self.changed = False
@@ -957,6 +1171,30 @@ class ParametersEditor(QWidget):
         self.changed = False
         self.load(self.item)
 
+    def field(self, interface):
+        """
+        Form row widgets for interface, added to the form on first use.
+        Rows are pooled per node class, to keep its interfaces order.
+        @type interface : L{flow.Interface}
+        @rtype: tuple (L{QLabel}, L{ParameterField})
+        """
+        key = (interface.node.fullname(), interface.name)
+        entry = self._fields.get(key)
+        if entry is None:
+            w = ParameterField(interface)
+            # Trick to have tooltip on form row
+            qlabel = QLabel(w.label)
+            # Connect checkbox event
+            w.checkbox.stateChanged.connect(self.showSlot)
+            w.edit.textChanged.connect(self.entriesChanged)
+            w.edit.returnPressed.connect(self.save)
+            self.formlayout.addRow(qlabel, w)
+            entry = self._fields[key] = (qlabel, w)
+        else:
+            entry[1].setInterface(interface)
+        entry[0].setToolTip(interface.doc)
+        return entry
+
     def load(self, item):
         self.clear()
         self.item = item
@@ -964,23 +1202,17 @@ class ParametersEditor(QWidget):
         self.informationbox.setTitle(item.node.category + " : " + item.node.label)
         self.lbldescription.setText(item.node.description)
 
+        blocked = self.nodeId.blockSignals(True)
         self.nodeId.setText(item.node.id)
-        # For each node interface, add a widget
+        self.nodeId.blockSignals(blocked)
+        # For each node interface, show its form row
         for interface in item.node.interfaces:
             if interface.isValue() and interface.isInput():
-                w = ParameterField(interface)
-                # Trick to have tooltip on form row
-                qlabel = QLabel(w.label)
-                qlabel.setToolTip(w.interface.doc)
-                self.formlayout.addRow(qlabel, w)
-                # Connect checkbox event
-                w.checkbox.stateChanged.connect(self.showSlot)
-                w.edit.textChanged.connect(self.entriesChanged)
-                w.edit.returnPressed.connect(self.save)
+                qlabel, w = self.field(interface)
+                qlabel.show()
+                w.show()
                 # Keep track of associations for saving
                 self.extrafields[interface.name] = w
-        self.nodeId.textChanged.connect(self.entriesChanged)
-        self.nodeId.returnPressed.connect(self.save)
         self.enable()
 
     def save(self):
@@ -1013,6 +1245,14 @@ class ParametersEditor(QWidget):
 
 
 class FlowConsole(QWidget):
+    #: oldest lines are dropped beyond this count
+    MAX_LINES = 5000
+    #: process output is shown at most every FLUSH_DELAY milliseconds
+    FLUSH_DELAY = 50
+    #: bytes shown per stream and per flush, the rest waits for next flush
+    FLUSH_BYTES = 64 * 1024
+    #: oldest buffered output is dropped beyond this size (e.g. console hidden)
+    MAX_BUFFER = 1024 * 1024
 
     def __init__(self, *args):
         QWidget.__init__(self, *args)
@@ -1035,8 +1275,23 @@ class FlowConsole(QWidget):
         hbox = QWidget()
         hbox.setLayout(hlbox)
 
-        self.console = QTextEdit()
-        self.console.setAcceptRichText(False)
+        self.console = QPlainTextEdit()
+        self.console.setReadOnly(True)
+        self.console.setMaximumBlockCount(self.MAX_LINES)
+        self.stdoutformat = QTextCharFormat()
+        self.stdoutformat.setForeground(QBrush(Qt.black))
+        self.stderrformat = QTextCharFormat()
+        self.stderrformat.setForeground(QBrush(Qt.red))
+        # Process output, until next flush
+        self._outbuf = bytearray()
+        self._errbuf = bytearray()
+        # Characters may be split between two flushes
+        self._outdecoder = codecs.getincrementaldecoder('utf-8')('replace')
+        self._errdecoder = codecs.getincrementaldecoder('utf-8')('replace')
+        self._flushtimer = QTimer(self)
+        self._flushtimer.setSingleShot(True)
+        self._flushtimer.setInterval(self.FLUSH_DELAY)
+        self._flushtimer.timeout.connect(self.flush)
 
         self.mainlayout = QVBoxLayout()
         self.mainlayout.addWidget(hbox)
@@ -1054,7 +1309,7 @@ class FlowConsole(QWidget):
 
     def attachProcess(self, process):
         self.process = process
-        self.console.clear()
+        self.clear()
         self.enable()
 
     def detachProcess(self):
@@ -1062,22 +1317,81 @@ class FlowConsole(QWidget):
         self.enable()
 
     def clear(self):
-        self.console.setText('')
+        self._flushtimer.stop()
+        del self._outbuf[:]
+        del self._errbuf[:]
+        self._outdecoder.reset()
+        self._errdecoder.reset()
+        self.console.setPlainText('')
+
+    def _onStdout(self):
+        if self.process is not None:
+            self._buffer(self._outbuf, self.process.readAllStandardOutput())
 
-    def updateConsole(self):
+    def _onStderr(self):
         if self.process is not None:
-            stdout = self.process.readAllStandardOutput().trimmed()
-            if stdout:
-                stdout = stdout.replace(b"<",  b"&lt;")
-                stdout = stdout.replace(b">",  b"&gt;")
-                stdout = stdout.replace(b"\n", b"<br/>")
-                self.console.append("<span style=\"color: black\">" + bytes(stdout).decode('utf-8') + "</span>")
-            stderr = self.process.readAllStandardError().trimmed()
-            if stderr:
-                stderr = stderr.replace(b"<", b"&lt;")
-                stderr = stderr.replace(b">", b"&gt;")
-                stderr = stderr.replace(b"\n", b"<br/>")
-                self.console.append("<span style=\"color: red\">" + bytes(stderr).decode('utf-8') + "</span>")
+            self._buffer(self._errbuf, self.process.readAllStandardError())
+
+    def _buffer(self, buf, data):
+        """
+        @type buf : bytearray
+        @type data : L{QByteArray}
+        """
+        data = bytes(data)
+        buf.extend(data)
+        excess = len(buf) - self.MAX_BUFFER
+        if excess > 0:
+            # Drop oldest lines, these would be dropped by console anyway
+            cut = buf.find(b'\n', excess)
+            del buf[:excess if cut < 0 else cut + 1]
+            if buf is self._outbuf:
+                self._outdecoder.reset()
+            else:
+                self._errdecoder.reset()
+        # Whitespace only is kept for later, but not worth a flush
+        if not data or data.isspace():
+            return
+        # Nothing is shown while hidden, see MainWindow._tabChanged
+        if self.console.isVisible() and not self._flushtimer.isActive():
+            self._flushtimer.start()
+
+    def flush(self):
+        """
+        Show buffered process output, unless console is hidden.
+        """
+        if not self.console.isVisible():
+            return
+        for buf, decoder, textformat in ((self._outbuf, self._outdecoder, self.stdoutformat),
+                                         (self._errbuf, self._errdecoder, self.stderrformat)):
+            if buf:
+                # Decode at most FLUSH_BYTES at once, ending on a full line if possible
+                size = len(buf)
+                if size > self.FLUSH_BYTES:
+                    cut = buf.rfind(b'\n', 0, self.FLUSH_BYTES)
+                    size = self.FLUSH_BYTES if cut < 0 else cut + 1
+                text = decoder.decode(bytes(buf[:size])).strip()
+                del buf[:size]
+                if text:
+                    self.appendText(text, textformat)
+        # Leftovers are shown in next flush, letting the event loop run
+        if (self._outbuf or self._errbuf) and not self._flushtimer.isActive():
+            self._flushtimer.start()
+
+    def appendText(self, text, textformat):
+        """
+        Add text in a new paragraph at the end of console
+        @type textformat : L{QTextCharFormat}
+        """
+        scrollbar = self.console.verticalScrollBar()
+        follow = scrollbar.value() == scrollbar.maximum()
+        cursor = QTextCursor(self.console.document())
+        cursor.movePosition(QTextCursor.End)
+        if not self.console.document().isEmpty():
+            cursor.insertBlock()
+        cursor.insertText(text, textformat)
+        # Keep following output, unless user scrolled up
+        if follow:
+            scrollbar.setValue(scrollbar.maximum())
 
 """
     
@@ -1086,19 +1400,50 @@ class FlowConsole(QWidget):
 """
 
 
+class IconResolver(QObject):
+    """
+    Finds icons files in a worker thread, see L{MainWindow.setActionIcon}.
+    Icons themselves are built by receivers, in the GUI thread.
+    """
+    resolved = pyqtSignal(str, str)
+
+    class Task(QRunnable):
+        def __init__(self, resolver, iconid):
+            QRunnable.__init__(self)
+            self.resolver = resolver
+            self.iconid = iconid
+
+        def run(self):
+            path = MainWindow.findIconFile(self.iconid)
+            self.resolver.resolved.emit(self.iconid, path or '')
+
+    def resolve(self, iconid):
+        """
+        @type iconid : str
+        """
+        QThreadPool.globalInstance().start(IconResolver.Task(self, iconid))
+
+
 class MainWindow(QMainWindow):
     """
     @type ScissorsCursor : {QCursor}
     """
     ScissorsCursor = None
+    #: height of scene strips rendered at once when exporting to PNG
+    EXPORT_STRIP_HEIGHT = 512
 
     def __init__(self, filename=None, *args):
         QMainWindow.__init__(self, *args)
+        self.iconresolver = IconResolver(self)
+        self.iconresolver.resolved.connect(self._iconResolved)
+        self._pendingicons = {}
         MainWindow.ScissorsCursor = QCursor(self.loadIcon('cursor-scissors').pixmap(QSize(24, 24)))
         self.apptitle = florun.__title__
         # Main attributes
         self.basedir = florun.base_dir
         self.asked = False
+        self._savedstatedirty = False
+        self._savemsgbox = None
         self.tmpfile = None
         self.flow = None
         self.buildActions()
@@ -1123,6 +1468,11 @@ class MainWindow(QMainWindow):
         self.scene = DiagramScene(self)
         self.view = QGraphicsView(self.scene)
         self.view.setRenderHint(QPainter.Antialiasing)
+        # Many small items change during drags : repainting everything is
+        # cheaper than computing dirty regions.
+        self.view.setViewportUpdateMode(QGraphicsView.FullViewportUpdate)
+        if florun.opengl:
+            self.setOpenGLViewport(self.view)
         # Node library
         self.nodelibrary = NodeLibrary()
         # Parameters Panel
@@ -1146,18 +1496,37 @@ class MainWindow(QMainWindow):
         self.maintabs = QTabWidget()
         self.maintabs.addTab(diagrampanel, "Scheme")
         self.maintabs.addTab(self.console, "Console")
+        self.maintabs.currentChanged.connect(self._tabChanged)
         self.setCentralWidget(self.maintabs)
 
-        # Connect events
-        self.scene.diagramItemSelected.connect(self._diagramItemSelected)
-        self.scene.diagramItemCreated.connect(self._diagramItemCreated)
-        self.scene.diagramItemRemoved.connect(self._diagramItemRemoved)
-        self.scene.connectorCreated.connect(self._connectorCreated)
-        self.scene.connectorRemoved.connect(self._connectorRemoved)
-        self.scene.diagramItemMoved.connect(self._diagramItemMoved)
+        # Connect events, once for all
+        scene = self.scene
+        scene.diagramItemSelected.connect(self._diagramItemSelected)
+        scene.diagramItemCreated.connect(self._diagramItemCreated)
+        scene.diagramItemRemoved.connect(self._diagramItemRemoved)
+        scene.connectorCreated.connect(self._connectorCreated)
+        scene.connectorRemoved.connect(self._connectorRemoved)
+        scene.diagramItemMoved.connect(self._diagramItemMoved)
 
         self.parameters.diagramItemChanged.connect(self._diagramItemChanged)
 
+    def setOpenGLViewport(self, view):
+        """
+        Render view with OpenGL, if available.
+        @type view : L{QGraphicsView}
+        """
+        try:
+            from PyQt5.QtWidgets import QOpenGLWidget
+        except ImportError:
+            logger.warning("OpenGL is not available, using raster rendering.")
+            return
+        view.setViewport(QOpenGLWidget())
+
+    def _tabChanged(self, index):
+        # Show output received while console was hidden
+        if self.maintabs.widget(index) is self.console:
+            self.console.flush()
+
     def loadPreferences(self):
         # Center of the screen by default
         self.setGeometry(100, 100, 800, 500)
@@ -1194,12 +1563,32 @@ class MainWindow(QMainWindow):
     def setStatusMessage(self, txt, timeout=6000):
         self.statusBar().showMessage(txt, timeout)
 
-    def loadIcon(self, iconid):
+    #: icon files paths by name without extension, for each icons folder
+    _iconindexes = {}
+    _iconlock = threading.Lock()
+    ICONS_DIRS = [florun.icons_dir, '/usr/share/icons/']
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def loadIcon(iconid):
         """
         @param iconid : Freedesktop identifier from http://standards.freedesktop.org/icon-naming-spec/icon-naming-spec-latest.html
         @type iconid : str
         @rtype: L{QtGui.QIcon}
         """
+        icon = MainWindow.standardIcon(iconid)
+        if icon is not None:
+            return icon
+        # Else
+        # Guess path of icon
+        return MainWindow.fileIcon(MainWindow.findIconFile(iconid))
+
+    @staticmethod
+    def standardIcon(iconid):
+        """
+        Themed or Qt default icon, if any.
+        @rtype: L{QtGui.QIcon} or None
+        """
         # Try Themed Icons (Qt >= 4.6)
         try:
             if QIcon.hasThemeIcon(iconid):
@@ -1218,64 +1607,123 @@ class MainWindow(QMainWindow):
                   'application-exit': QStyle.SP_DialogCloseButton}
         qticonid = lookup.get(iconid)
         if qticonid is not None:
-            style = self.style()
+            style = QApplication.style()
             return style.standardIcon(qticonid)
+        return None
 
-        # Else
-        # Guess path of icon
-        for base in [florun.icons_dir, '/usr/share/icons/']:
-            find = QProcess()
-            find.start('find %s -name "%s*"' % (base, iconid))
-            if find.waitForFinished():
-                list = find.readAllStandardOutput().split("\n")
-                if len(list) > 0:
-                    path = bytes(list[0]).decode('utf-8')
-                    if path != '':
-                        logger.debug("Load icon file from '%s'" % path)
-                        return QIcon(QPixmap(path))
+    @staticmethod
+    def fileIcon(path):
+        """
+        @type path : str or None
+        @rtype: L{QtGui.QIcon}
+        """
+        if path:
+            logger.debug("Load icon file from '%s'" % path)
+            return QIcon(QPixmap(path))
         return QIcon(QPixmap())
 
+    @staticmethod
+    def findIconFile(iconid):
+        """
+        Each icons folder is scanned once, when first needed, first match wins.
+        Safe to call from any thread.
+        @type iconid : str
+        @rtype: str or None
+        """
+        for base in MainWindow.ICONS_DIRS:
+            with MainWindow._iconlock:
+                index = MainWindow._iconindexes.get(base)
+                if index is None:
+                    index = {}
+                    for dirpath, dirnames, filenames in os.walk(base):
+                        dirnames.sort()
+                        for filename in sorted(filenames):
+                            index.setdefault(os.path.splitext(filename)[0], os.path.join(dirpath, filename))
+                    MainWindow._iconindexes[base] = index
+            path = index.get(iconid)
+            if path is None:
+                # Same as a "iconid*" pattern
+                for name in sorted(index):
+                    if name.startswith(iconid):
+                        return index[name]
+            else:
+                return path
+        return None
+
+    def setActionIcon(self, action, iconid):
+        """
+        Icon files are searched in background, action icon is set once found.
+        @type action : L{QAction}
+        """
+        icon = self.standardIcon(iconid)
+        if icon is not None:
+            action.setIcon(icon)
+            return
+        actions = self._pendingicons.setdefault(iconid, [])
+        actions.append(action)
+        if len(actions) == 1:
+            self.iconresolver.resolve(iconid)
+
+    def _iconResolved(self, iconid, path):
+        icon = self.fileIcon(path)
+        for action in self._pendingicons.pop(iconid, []):
+            action.setIcon(icon)
+
     def buildActions(self):
-        self.new = QAction(self.loadIcon('document-new'), 'New', self)
+        self.new = QAction('New', self)
+        self.setActionIcon(self.new, 'document-new')
         self.new.setShortcut('Ctrl+N')
         self.new.setStatusTip('New flow')
         self.new.triggered.connect(self.newFlow)
 
-        self.open = QAction(self.loadIcon('document-open'), 'Open', self)
+        self.open = QAction('Open', self)
+        self.setActionIcon(self.open, 'document-open')
         self.open.setShortcut('Ctrl+O')
         self.open.setStatusTip('Open flow')
         self.open.triggered.connect(self.loadFlow)
 
-        self.save = QAction(self.loadIcon('document-save'), 'Save', self)
+        self.save = QAction('Save', self)
+        self.setActionIcon(self.save, 'document-save')
         self.save.setShortcut('Ctrl+S')
         self.save.setStatusTip('Save flow')
         self.save.triggered.connect(self.saveFlow)
 
-        self.export = QAction(self.loadIcon('image-x-generic'), 'Export', self)
+        self.export = QAction('Export', self)
+        self.setActionIcon(self.export, 'image-x-generic')
         self.export.setShortcut('Ctrl+Shift+S')
         self.export.setStatusTip('Export flow to image')
         self.export.triggered.connect(self.exportFlow)
 
-        self.exit = QAction(self.loadIcon('application-exit'), 'Exit', self)
+        self.exit = QAction('Exit', self)
+        self.setActionIcon(self.exit, 'application-exit')
         self.exit.setShortcut('Ctrl+Q')
         self.exit.setStatusTip('Exit application')
         self.exit. triggered.connect(self.close)
 
-        self.start = QAction(self.loadIcon('media-playback-start'), 'Start', self)
+        self.start = QAction('Start', self)
+        self.setActionIcon(self.start, 'media-playback-start')
         self.start.setShortcut('Ctrl+R')
         self.start.setStatusTip('Start flow')
         self.start.triggered.connect(self.startFlow)
 
-        self.stop = QAction(self.loadIcon('media-playback-stop'), 'Stop', self)
+        self.stop = QAction('Stop', self)
+        self.setActionIcon(self.stop, 'media-playback-stop')
         self.stop.setShortcut('Ctrl+S')
         self.stop.setStatusTip('Stop running flow')
         self.stop.triggered.connect(self.stopFlow)
         self.stop.setEnabled(False)
 
     def updateSavedState(self):
+        self.asked = False
+        # Calls within same event loop iteration result in one update
+        if not self._savedstatedirty:
+            self._savedstatedirty = True
+            QTimer.singleShot(0, self._flushSavedState)
+
+    def _flushSavedState(self):
+        self._savedstatedirty = False
         self.updateTitle()
         self.save.setEnabled(self.flow.modified)
-        self.asked = False
 
     def adjustView(self):
         self.view.setSceneRect(self.scene.itemsBoundingRect())
@@ -1340,7 +1788,7 @@ class MainWindow(QMainWindow):
         userentries = {}
         for name, edit in form.items():
             txt = edit.text()
-            if not empty(txt):
+            if txt.strip():
                 userentries[name] = txt
         return answer, userentries
 
@@ -1362,17 +1810,6 @@ class MainWindow(QMainWindow):
         errorbox.setDetailedText(tbinfo)
         errorbox.exec_()
 
-    @classmethod
-    def messageCancelSaveDiscard(cls, title, mainText, infoText):
-        msgBox = QMessageBox()
-        msgBox.setWindowTitle(title)
-        msgBox.setIcon(QMessageBox.Question)
-        msgBox.setText(mainText)
-        msgBox.setInformativeText(infoText)
-        msgBox.setStandardButtons(QMessageBox.Save | QMessageBox.Discard | QMessageBox.Cancel)
-        msgBox.setDefaultButton(QMessageBox.Save)
-        return msgBox.exec_()
-
     @classmethod
     def messageYesNo(cls, title, mainText, infoText):
         msgBox = QMessageBox()
@@ -1384,15 +1821,23 @@ class MainWindow(QMainWindow):
         msgBox.setDefaultButton(QMessageBox.Yes)
         return msgBox.exec_()
 
-    @classmethod
-    def messageCancelYesNo(cls, title, mainText, infoText):
-        msgBox = QMessageBox()
+    def _askSaveIfModified(self, title="Save flow ?"):
+        """
+        Ask to save current flow, the same message box is reused.
+        @return: L{QMessageBox.Save}, L{QMessageBox.Discard} (flow not modified) or L{QMessageBox.Cancel}
+        @rtype: int
+        """
+        if self.flow is None or not self.flow.modified:
+            return QMessageBox.Discard
+        msgBox = self._savemsgbox
+        if msgBox is None:
+            msgBox = self._savemsgbox = QMessageBox(self)
+            msgBox.setIcon(QMessageBox.Question)
+            msgBox.setText("The flow has been modified.")
+            msgBox.setInformativeText("Do you want to save your changes?")
+            msgBox.setStandardButtons(QMessageBox.Save | QMessageBox.Discard | QMessageBox.Cancel)
         msgBox.setWindowTitle(title)
-        msgBox.setIcon(QMessageBox.Question)
-        msgBox.setText(mainText)
-        msgBox.setInformativeText(infoText)
-        msgBox.setStandardButtons(QMessageBox.Yes | QMessageBox.No | QMessageBox.Cancel)
-        msgBox.setDefaultButton(QMessageBox.Yes)
+        msgBox.setDefaultButton(QMessageBox.Save)
         return msgBox.exec_()
 
     """
@@ -1435,7 +1880,13 @@ class MainWindow(QMainWindow):
         logger.debug("Main window: diagram connector created : {}".format(connector))
         start = connector.startItem.interface
         end = connector.endItem.interface
-        self.flow.addConnector(start, end)
+        try:
+            self.flow.addConnector(start, end)
+        except FlowError as e:
+            # e.g. connector would create a cycle
+            self.setStatusMessage(u"%s" % e)
+            self.scene.removeConnector(connector)
+            return
         # Update start nodes states
         self.scene.setStartNodes(self.flow.startNodes)
         self.updateSavedState()
@@ -1462,19 +1913,22 @@ class MainWindow(QMainWindow):
         Close the window.
         """
         # Ask to save if flow was modified
-        if self.flow.modified:
-            answer = self.messageCancelSaveDiscard(u"Save flow ?",
-                                                   "The flow has been modified.",
-                                                   "Do you want to save your changes?")
-            if answer == QMessageBox.Save:
-                if not self.saveFlow():
-                    event.ignore() # Was not saved, don't close
-                    return
-            if answer == QMessageBox.Cancel:
-                event.ignore() # Don't close
+        answer = self._askSaveIfModified()
+        if answer == QMessageBox.Save:
+            if not self.saveFlow():
+                event.ignore() # Was not saved, don't close
                 return
+        if answer == QMessageBox.Cancel:
+            event.ignore() # Don't close
+            return
         # Really quit
         self.savePreferences()
+        if self.tmpfile is not None:
+            try:
+                os.unlink(self.tmpfile.name)  # Delete flow temp file
+            except OSError as e:
+                logger.warning(e)
+            self.tmpfile = None
         event.accept()
 
     def newFlow(self):
@@ -1482,16 +1936,12 @@ class MainWindow(QMainWindow):
         Start a new flow
         """
         # Ask to save if flow was modified
-        if self.flow is not None:
-            if self.flow.modified:
-                answer = self.messageCancelYesNo("Save flow ?",
-                                                 "The flow has been modified.",
-                                                 "Do you want to save your changes?")
-                if answer == QMessageBox.Yes:
-                    if not self.saveFlow():
-                        return # Was not saved, don't clear.
-                if answer == QMessageBox.Cancel:
-                    return # Don't clear
+        answer = self._askSaveIfModified()
+        if answer == QMessageBox.Save:
+            if not self.saveFlow():
+                return # Was not saved, don't clear.
+        if answer == QMessageBox.Cancel:
+            return # Don't clear
         self.flow = Flow()
         self.scene.clear()
         self.parameters.clear()
@@ -1504,23 +1954,17 @@ class MainWindow(QMainWindow):
         """
         if not filename:
             # Ask to save if flow was modified
-            if self.flow is not None:
-                if self.flow.modified:
-                    answer = self.messageCancelYesNo("Save flow ?",
-                                                     "The flow has been modified.",
-                                                     "Do you want to save your changes?")
-                    if answer == QMessageBox.Yes:
-                        if not self.saveFlow():
-                            return # Was not saved, don't open.
-                    if answer == QMessageBox.Cancel:
-                        return # Don't open
+            answer = self._askSaveIfModified()
+            if answer == QMessageBox.Save:
+                if not self.saveFlow():
+                    return # Was not saved, don't open.
+            if answer == QMessageBox.Cancel:
+                return # Don't open
             # Ask the user
             filename, _ = QFileDialog.getOpenFileName(self, 'Open file', self.basedir)
-            print(filename)
             if filename == '': # User clicked cancel
                 return
 
-        print(filename)
         logger.debug("Load file '%s'..." % filename)
         self.basedir = os.path.dirname(filename)
         self.flow = Flow.load(filename)
@@ -1530,21 +1974,28 @@ class MainWindow(QMainWindow):
         # Switch to console tab
         self.maintabs.setCurrentIndex(0)
 
-        # Add graphical items
-        for i, n in enumerate(self.flow.nodes):
-            posx = n.graphicalprops.get('x', 50 * i)
-            posy = n.graphicalprops.get('y', 50 * i)
-            pos = QPointF(posx, posy)
-            diagramitem = self.scene.addDiagramItem(pos=pos, node=n, emit=False)
-        # Add connectors
-        for n in self.flow.nodes:
-            for interface in n.interfaces:
-                startitem = self.scene.findDiagramItemByNode(n)
-                startslot = startitem.findSlot(interface)
-                for successor in interface.successors:
-                    enditem = self.scene.findDiagramItemByNode(successor.node)
-                    endslot = enditem.findSlot(successor)
-                    self.scene.addConnector(startslot, endslot, emit=False)
+        # Repaint view once, when all items were added
+        self.view.setUpdatesEnabled(False)
+        try:
+            # Add graphical items
+            items = {}
+            for i, n in enumerate(self.flow.nodes):
+                posx = n.graphicalprops.get('x', 50 * i)
+                posy = n.graphicalprops.get('y', 50 * i)
+                pos = QPointF(posx, posy)
+                items[n] = self.scene.addDiagramItem(pos=pos, node=n, emit=False)
+            # Add connectors
+            for n in self.flow.nodes:
+                startitem = items[n]
+                for interface in n.interfaces:
+                    if not interface.successors:
+                        continue
+                    startslot = startitem.findSlot(interface)
+                    for successor in interface.successors:
+                        endslot = items[successor.node].findSlot(successor)
+                        self.scene.addConnector(startslot, endslot, emit=False)
+        finally:
+            self.view.setUpdatesEnabled(True)
         # Adjust view
         self.adjustView()
         # Update save buttons
@@ -1571,50 +2022,82 @@ class MainWindow(QMainWindow):
         """
         Export the flow to an image
         """
-        PADDING = 15
         # Ask filename to user
         filename, _ = QFileDialog.getSaveFileName(self, 'Export image', self.basedir)
         if not filename:  # User clicked cancel
             return False
         logger.debug(u"Export flow to image '%s'..." % filename)
+        return self.exportImage(filename)
+
+    def exportImage(self, filename):
+        """
+        Render the scene to an image file, format given by extension
+        @type filename : string
+        """
+        PADDING = 15
         # Compute scene rect
         sourceRect = self.scene.itemsBoundingRect()
         sourceRect.adjust(-PADDING, -PADDING, PADDING, PADDING)
-        targetRect = QRectF(QPointF(), sourceRect.size())
-        # Initialize painting
-        image = QImage(targetRect.size().toSize(), QImage.Format_ARGB32_Premultiplied)
+        sourceRect = QRectF(sourceRect.toRect())
+        size = sourceRect.size().toSize()
+        self.scene.clearSelection()
+        if os.path.splitext(filename)[1].lower() != '.png':
+            # Other formats can only be saved at once
+            self.renderImage(sourceRect, 0, size.height(), PADDING).save(filename)
+            return True
+        # Render and write horizontal strips, one at a time
+        with open(filename, 'wb') as f:
+            writer = PNGWriter(f, size.width(), size.height())
+            for top in range(0, size.height(), self.EXPORT_STRIP_HEIGHT):
+                height = min(self.EXPORT_STRIP_HEIGHT, size.height() - top)
+                strip = self.renderImage(sourceRect, top, height, PADDING)
+                strip = strip.convertToFormat(QImage.Format_RGBA8888)
+                writer.writeRows(strip.constBits().asstring(strip.byteCount()))
+            writer.close()
+        return True
+
+    def renderImage(self, sourceRect, top, height, padding):
+        """
+        Render an horizontal strip of the scene to a transparent image
+        @param sourceRect : whole exported scene area
+        @param top : strip offset in image
+        @rtype: L{QImage}
+        """
+        width = sourceRect.toRect().width()
+        image = QImage(QSize(width, height), QImage.Format_ARGB32_Premultiplied)
         image.fill(qRgba(0, 0, 0, 0))  # fill whole image + padding
         painter = QPainter(image)
         # TODO
         #painter.initFrom(self.view)
         painter.setBackgroundMode(Qt.TransparentMode)
         # Draw scene content
-        self.scene.clearSelection()
-        self.scene.render(painter, target=targetRect, source=QRectF(sourceRect.toRect()))
+        targetRect = QRectF(0, 0, width, height)
+        source = QRectF(sourceRect.x(), sourceRect.y() + top, width, height)
+        self.scene.render(painter, target=targetRect, source=source)
         # Draw flow filename in upper left corner
-        painter.drawText(QRectF(1, 1, targetRect.size().width(), PADDING), self.filename)
-        image.save(filename)
+        painter.drawText(QRectF(1, 1 - top, width, padding), self.filename)
         painter.end()
+        return image
 
     def startFlow(self):
         """
         Run current flow
         """
         flow = self.flow
-        if flow.modified and not self.asked:
-            answer = MainWindow.messageCancelYesNo("Save flow before execution ?",
-                                                   "The flow has been modified.",
-                                                   "Do you want to save your changes?")
-            if answer == QMessageBox.Yes:
+        if not self.asked:
+            answer = self._askSaveIfModified("Save flow before execution ?")
+            if answer == QMessageBox.Save:
                 self.saveFlow(flow)
             elif answer == QMessageBox.Cancel:
                 logger.debug("Flow start canceled by user.")
                 return
-            else:
+            elif flow.modified:
                 self.asked = True  # Only ask once.
-        # If no explicit save, use temp file
-        self.tmpfile = tempfile.NamedTemporaryFile('w')
+        # If no explicit save, use temp file (kept for next runs)
         if self.asked:
+            if self.tmpfile is None:
+                self.tmpfile = tempfile.NamedTemporaryFile('wb', suffix='.flo', delete=False)
+                self.tmpfile.close()  # Rewritten in place by Flow.save()
             flow = flow.clone()
             flow.filename = self.tmpfile.name
             flow.save()
@@ -1635,7 +2118,6 @@ class MainWindow(QMainWindow):
             answer, userargs = self.FlowCLIArguments(cliargs)
             if answer == QDialog.Rejected:
                 logger.debug("Flow start canceled by user.")
-                self.tmpfile.close()  # Delete temp file since unnecessary
                 return
 
         self.setStatusMessage("Flow is now running.", 0)  # no timeout
@@ -1648,12 +2130,12 @@ class MainWindow(QMainWindow):
         self.nodelibrary.setEnabled(False)
 
         # Create process
-        self.process = QProcess()
-        self.console.attachProcess(self.process)
-        self.process.readyReadStandardOutput.connect(self.console.updateConsole)
-        self.process.readyReadStandardError.connect(self.console.updateConsole)
+        process = self.process = QProcess()
+        self.console.attachProcess(process)
+        process.readyReadStandardOutput.connect(self.console._onStdout)
+        process.readyReadStandardError.connect(self.console._onStderr)
         # TODO: (int, QProcess::ExitStatus)
-        self.process.finished.connect(self.onFinishedFlow)
+        process.finished.connect(self.onFinishedFlow)
 
         # Run command
         cmd = florun.build_exec_cmd(flow, self.console.loglevel(), userargs)
@@ -1681,7 +2163,6 @@ class MainWindow(QMainWindow):
             msg = "Flow execution interrupted by user."
         logger.debug(msg)
         self.setStatusMessage(msg)
-        self.tmpfile.close()  # Delete flow temp file
         # Reinitialize GUI
         self.console.detachProcess()
         self.process = None
@@ -1,3 +1,4 @@
+import io
 import sys
 import subprocess
 import shlex
@@ -19,13 +20,13 @@ class ShellProcessNode(ProcessNode):
     label    = _(u"Shell Process")
     description = _(u"Execute a shell command")
 
-    def __init__(self, *args, **kwargs):
-        super(ShellProcessNode, self).__init__(*args, **kwargs)
-        self.stdin   = InterfaceStream(self, 'stdin',  default='EOF', type=Interface.INPUT,  doc="standard input")
-        self.stdout  = InterfaceStream(self, 'stdout', default='EOF', type=Interface.OUTPUT, doc="standard output")
-        self.stderr  = InterfaceStream(self, 'stderr', default='EOF', type=Interface.OUTPUT, doc="standard error output")
-        self.command = InterfaceValue(self,  'cmd',    default='',    type=Interface.PARAMETER, slot=False, doc="command to run")
-        self.result  = InterfaceValue(self,  'result', default=0,     type=Interface.RESULT, doc="execution code return")
+    _interface_specs = [
+        ('stdin',   InterfaceStream, 'stdin',  dict(default='EOF', type=Interface.INPUT,  doc="standard input")),
+        ('stdout',  InterfaceStream, 'stdout', dict(default='EOF', type=Interface.OUTPUT, doc="standard output")),
+        ('stderr',  InterfaceStream, 'stderr', dict(default='EOF', type=Interface.OUTPUT, doc="standard error output")),
+        ('command', InterfaceValue,  'cmd',    dict(default='',    type=Interface.PARAMETER, slot=False, doc="command to run")),
+        ('result',  InterfaceValue,  'result', dict(default=0,     type=Interface.RESULT, doc="execution code return")),
+    ]
 
     def run(self):
         # Run cmd with input from stdin, and send output to stdout/stderr, result code
@@ -41,12 +42,14 @@ class CommandLineParameterInputNode(InputNode):
     label       = _(u"CLI Param")
     description = _(u"Read a Command-Line Interface parameter")
 
+    _interface_specs = [
+        ('name',    InterfaceValue, 'name',    dict(default='', type=Interface.PARAMETER, slot=False, doc=_("Command line interface parameter name"))),
+        ('value',   InterfaceValue, 'value',   dict(default='', type=Interface.OUTPUT,    doc=_("value retrieved"))),
+        ('default', InterfaceValue, 'default', dict(default='', type=Interface.PARAMETER, slot=False, doc=_("default value if not specified at runtime"))),
+    ]
+
     def __init__(self, *args, **kwargs):
         InputNode.__init__(self, *args, **kwargs)
-        self.name    = InterfaceValue(self, 'name',    default='', type=Interface.PARAMETER, slot=False, doc=_("Command line interface parameter name"))
-        self.value   = InterfaceValue(self, 'value',   default='', type=Interface.OUTPUT,    doc=_("value retrieved"))
-        self.default = InterfaceValue(self, 'default', default='', type=Interface.PARAMETER, slot=False, doc=_("default value if not specified at runtime"))
-
         #: L{optparse.Values}
         self.options = None
 
@@ -74,12 +77,12 @@ class CommandLineStdinInputNode(InputNode):
     label    = _(u"CLI Stdin")
     description = _(u"Read the Command-Line Interface standard input")
 
-    def __init__(self, *args, **kwargs):
-        InputNode.__init__(self, *args, **kwargs)
-        self.output = InterfaceStream(self, 'output', default='EOF', type=Interface.OUTPUT, doc="standard input content")
+    _interface_specs = [
+        ('output', InterfaceStream, 'output', dict(default='EOF', type=Interface.OUTPUT, doc="standard input content")),
+    ]
 
     def run(self):
-        for line in sys.stdin:
+        for line in sys.stdin.buffer:
             self.output.write(line)
         self.output.flush()
 
@@ -89,12 +92,20 @@ class CommandLineStdoutOutputNode(OutputNode):
     label       = _(u"CLI Stdout")
     description = _(u"Write to the Command-Line Interface standard output")
 
+    _interface_specs = [
+        ('input', InterfaceStream, 'input', dict(default='EOF', type=Interface.INPUT, doc="standard output")),
+    ]
+
     def __init__(self, *args, **kwargs):
         OutputNode.__init__(self, *args, **kwargs)
         self.outstream = sys.stdout
-        self.input     = InterfaceStream(self, 'input', default='EOF', type=Interface.INPUT, doc="standard output")
 
     def run(self):
-        for line in self.input:
-            self.outstream.write(line)
-        self.outstream.flush()
+        # Input stream holds raw bytes, decode them for the text output
+        text = io.TextIOWrapper(self.input.stream, encoding='utf-8')
+        try:
+            for line in text:
+                self.outstream.write(line)
+            self.outstream.flush()
+        finally:
+            text.detach()
@@ -16,10 +16,10 @@ class FileInputNode(InputNode):
     label       = _(u"File")
     description = _(u"Read the content of a file")
 
-    def __init__(self, *args, **kwargs):
-        InputNode.__init__(self, *args, **kwargs)
-        self.filepath = InterfaceValue(self,  'filepath', default='',    type=Interface.PARAMETER, slot=False, doc="file to read")
-        self.output   = InterfaceStream(self, 'output',   default='EOF', type=Interface.OUTPUT,    doc="file content")
+    _interface_specs = [
+        ('filepath', InterfaceValue,  'filepath', dict(default='',    type=Interface.PARAMETER, slot=False, doc="file to read")),
+        ('output',   InterfaceStream, 'output',   dict(default='EOF', type=Interface.OUTPUT,    doc="file content")),
+    ]
 
     def run(self):
         # Read file content and pass to output interface
@@ -37,10 +37,10 @@ class FileOutputNode(OutputNode):
     label    = _(u"File")
     description = _(u"Write the content to a file")
 
-    def __init__(self, *args, **kwargs):
-        OutputNode.__init__(self, *args, **kwargs)
-        self.filepath = InterfaceValue(self, 'filepath', default='',  type=Interface.PARAMETER, slot=False, doc="file to write")
-        self.input    = InterfaceStream(self, 'input', default='EOF', type=Interface.INPUT, doc="input to write")
+    _interface_specs = [
+        ('filepath', InterfaceValue,  'filepath', dict(default='',    type=Interface.PARAMETER, slot=False, doc="file to write")),
+        ('input',    InterfaceStream, 'input',    dict(default='EOF', type=Interface.INPUT,     doc="input to write")),
+    ]
 
     def run(self):
         self.info(_("Write content to file '%s'") % self.filepath.value)
@@ -54,10 +54,10 @@ class FileListInputNode(InputNode):
     label    = _(u"File list")
     description = _(u"List files of a folder")
 
-    def __init__(self, *args, **kwargs):
-        InputNode.__init__(self, *args, **kwargs)
-        self.folder   = InterfaceValue(self, 'folder',   default='', type=Interface.PARAMETER, slot=False, doc="folder to scan")
-        self.filelist = InterfaceList(self,  'filelist', default='', type=Interface.OUTPUT,    doc="list of file paths")
+    _interface_specs = [
+        ('folder',   InterfaceValue, 'folder',   dict(default='', type=Interface.PARAMETER, slot=False, doc="folder to scan")),
+        ('filelist', InterfaceList,  'filelist', dict(default='', type=Interface.OUTPUT,    doc="list of file paths")),
+    ]
 
     def run(self):
         path = self.folder.value
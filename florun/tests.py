@@ -1,14 +1,19 @@
 #!/usr/bin/python
 # -*- coding: utf8 -*-
+import io
 import os
 import sys
+import zlib
+import struct
 import unittest
 import logging
 import tempfile
+from xml.sax.saxutils import quoteattr
 
 from . import plugins_dirs
-from .flow import Flow, Node, Interface, FlowError, NodeNotFoundError, Runner
-from .utils import import_plugins
+from .flow import (Flow, Node, Interface, FlowError, FlowParsingError, NodeNotFoundError, Runner,
+                   ValueInputNode, InterfaceValue, InterfaceStream, InterfaceList)
+from .utils import import_plugins, PNGWriter
 
 # Extends current python path with all plugins dirs
 sys.path.extend(plugins_dirs.split(os.pathsep))
@@ -25,6 +30,25 @@ class INode(Node):
         self.i4 = Interface(self, 'i4', type=Interface.RESULT)
 
 
+class SNode(Node):
+    def __init__(self, *args, **kwargs):
+        Node.__init__(self, *args, **kwargs)
+        self.items  = InterfaceList(self, 'items', type=Interface.OUTPUT)
+        self.input  = InterfaceStream(self, 'input', type=Interface.INPUT)
+        self.output = InterfaceStream(self, 'output', type=Interface.OUTPUT)
+
+
+class PNode(Node):
+    _interface_specs = [
+        ('a',      InterfaceValue, 'a',   dict(type=Interface.INPUT)),
+        ('b',      InterfaceValue, 'b',   dict(type=Interface.INPUT)),
+        ('output', InterfaceValue, 'out', dict(type=Interface.OUTPUT)),
+    ]
+
+    def run(self):
+        self.output.value = (self.a.value, self.b.value)
+
+
 class TestFlow(unittest.TestCase):
 
     def setUp(self):
@@ -68,6 +92,31 @@ class TestFlow(unittest.TestCase):
         self.flow.addNode(n)
         self.assertNotEqual(n, self.flow.findNode(''))
         self.assertEqual(n, self.flow.findNode('bar'))
+        # Follow id changes
+        n.id = 'baz'
+        self.assertEqual(n, self.flow.findNode('baz'))
+        self.assertRaises(NodeNotFoundError, self.flow.findNode, 'bar')
+        # Duplicate ids are refused, index is kept
+        other = Node(id='qux')
+        self.flow.addNode(other)
+        with self.assertRaises(FlowError):
+            n.id = 'qux'
+        self.assertEqual('baz', n.id)
+        self.assertEqual(other, self.flow.findNode('qux'))
+        self.assertEqual(n, self.flow.findNode('baz'))
+        self.flow.removeNode(n)
+        self.assertRaises(NodeNotFoundError, self.flow.findNode, 'baz')
+
+    def test_clone(self):
+        clone = self.f1.clone()
+        self.assertEqual(self.f1.nodes, clone.nodes)
+        n = Node(id='foo')
+        clone.addNode(n)
+        clone.removeNode(self.n2)
+        self.assertEqual([self.n1, self.n2], self.f1.nodes)
+        self.assertRaises(NodeNotFoundError, self.f1.findNode, 'foo')
+        self.assertFalse(n in self.f1.startNodes)
+        self.assertTrue(self.n2 in self.f1.startNodes)
 
     def test_randomId(self):
         class FooNode(Node):
@@ -91,6 +140,15 @@ class TestFlow(unittest.TestCase):
         self.assertFalse(self.n2 in self.f1.startNodes)
         self.assertRaises(FlowError, self.f1.addConnector, self.n2.i1, self.n1.i2)
 
+    def test_addConnector_cycle(self):
+        n3 = INode()
+        self.f1.addNode(n3)
+        self.f1.addConnector(self.n1.i2, self.n2.i1)
+        self.f1.addConnector(self.n2.i2, n3.i1)
+        self.assertRaises(FlowError, self.f1.addConnector, n3.i2, self.n1.i1)
+        self.assertFalse(self.n1.i1 in n3.i2.successors)
+        self.assertEqual(0, len(self.n1.predecessors))
+
     def test_removeConnector(self):
         self.f1.addConnector(self.n2.i2, self.n1.i1)
         self.assertRaises(FlowError, self.f1.removeConnector, self.n1.i1, self.n2.i2)
@@ -103,6 +161,62 @@ class TestFlow(unittest.TestCase):
         self.assertEqual(0, len(self.n2.predecessors))
         self.assertRaises(FlowError, self.f1.removeConnector, self.n2.i2, self.n1.i1)
 
+    def test_sortNodesByIncidence(self):
+        a, b, c, d = [INode(id=i) for i in 'abcd']
+        for n in [d, c, b, a]:
+            self.flow.addNode(n)
+        # Diamond a -> b -> d, a -> c -> d, added against insertion order
+        self.flow.addConnector(b.i2, d.i1)
+        self.flow.addConnector(c.i2, d.i1)
+        self.flow.addConnector(a.i2, b.i1)
+        self.flow.addConnector(a.i4, c.i1)
+        self.flow.sortNodesByIncidence()
+        self.assertEqual([a, b, c, d], self.flow.nodes)
+        self.assertEqual([1, 2, 2, 3], [n.incidence for n in self.flow.nodes])
+
+    def test_exportImportXml(self):
+        value = ValueInputNode(id='value')
+        value.input.value = 'foo'
+        value.graphicalprops['x'] = 10
+        output = file.FileOutputNode(id='output')
+        output.filepath.slot = True
+        self.flow.addNode(value)
+        self.flow.addNode(output)
+        self.flow.addConnector(value.output, output.filepath)
+        xml = self.flow.exportXml()
+        f = Flow.importXml(xml)
+        self.assertEqual(['value', 'output'], [n.id for n in f.nodes])
+        value, output = f.nodes
+        self.assertEqual(ValueInputNode, value.__class__)
+        self.assertEqual('foo', value.input.value)
+        self.assertFalse(value.input.slot)
+        self.assertEqual(10, value.graphicalprops['x'])
+        self.assertTrue(output.filepath in value.output.successors)
+        self.assertEqual(xml, f.exportXml())
+
+    def test_save_failure(self):
+        tmp = tempfile.NamedTemporaryFile(suffix='.flo')
+        self.f1.save(tmp.name)
+        with open(tmp.name, 'rb') as fd:
+            saved = fd.read()
+        self.assertTrue(saved)
+        def broken():
+            yield u"<flow>\n"
+            raise ValueError()
+        self.f1._xmlParts = broken
+        self.assertRaises(ValueError, self.f1.save, tmp.name)
+        # Previous file is left untouched
+        with open(tmp.name, 'rb') as fd:
+            self.assertEqual(saved, fd.read())
+        tmp.close()
+
+    def test_importXml_unknown(self):
+        for classname in ['Unknown', 'os.system', '__import__("os")']:
+            xml = '<flow><node id="a" type=%s /></flow>' % quoteattr(classname)
+            self.assertRaises(FlowParsingError, Flow.importXml, xml)
+        f = Flow.importXml('<flow><node id="a" type="ValueInputNode" /></flow>')
+        self.assertEqual(ValueInputNode, f.nodes[0].__class__)
+
 
 class TestInterface(unittest.TestCase):
 
@@ -165,6 +279,31 @@ class TestInterface(unittest.TestCase):
         self.assertFalse(self.i1 in self.i2.predecessors)
 
 
+    def test_streamLoad(self):
+        n1 = SNode()
+        n2 = SNode()
+        n1.items.items = ['foo', 'bar']
+        n1.items.addSuccessor(n2.input)
+        n2.input.load(n1.items)
+        self.assertEqual([b'foo\n', b'bar\n'], list(n2.input))
+        n2.input.clean()
+
+    def test_streamLoadAll(self):
+        n1 = SNode()
+        n2 = SNode()
+        n3 = SNode()
+        n1.output.write(b'foo\n')
+        n2.items.items = ['bar']
+        n1.output.addSuccessor(n3.input)
+        n2.items.addSuccessor(n3.input)
+        n3.input.onContentReady(n1.output)
+        self.assertEqual([n1.output], n3.input._pending_loads)
+        n3.input.onContentReady(n2.items)
+        self.assertEqual([b'foo\n', b'bar\n'], list(n3.input))
+        for n in (n1, n2, n3):
+            n.clean()
+
+
 class TestNode(unittest.TestCase):
 
     def setUp(self):
@@ -204,7 +343,40 @@ class TestNode(unittest.TestCase):
 
 
 class TestRunner(unittest.TestCase):
+
+    def test_value_flow(self):
+        flow = Flow()
+        nodes = [ValueInputNode() for i in range(50)]
+        for n in nodes:
+            flow.addNode(n)
+        nodes[0].input.value = 'foo'
+        for n1, n2 in zip(nodes, nodes[1:]):
+            n2.input.slot = True
+            flow.addConnector(n1.output, n2.input)
+        Runner(flow).start()
+        self.assertEqual(['foo'] * 50, [n.output.value for n in nodes])
     
+    def test_run_twice(self):
+        flow = Flow()
+        nodes = [ValueInputNode() for i in range(3)]
+        for n in nodes:
+            flow.addNode(n)
+        for n1, n2 in zip(nodes, nodes[1:]):
+            n2.input.slot = True
+            flow.addConnector(n1.output, n2.input)
+        pair = PNode()
+        flow.addNode(pair)
+        other = ValueInputNode()
+        flow.addNode(other)
+        flow.addConnector(nodes[-1].output, pair.a)
+        flow.addConnector(other.output, pair.b)
+        for value in ('foo', 'bar'):
+            nodes[0].input.value = value
+            other.input.value = value * 2
+            Runner(flow).start()
+            self.assertEqual([value] * 3, [n.output.value for n in nodes])
+            self.assertEqual((value, value * 2), pair.output.value)
+
     def test_very_simple_flow(self):
         logging.basicConfig()
         
@@ -226,10 +398,33 @@ class TestRunner(unittest.TestCase):
         
         lines = tmp.readlines()
         self.assertTrue(lines)
-        self.assertEqual("#!/usr/bin/python\n", lines[0])
-        self.assertEqual("    unittest.main()\n", lines[-1])
+        self.assertEqual(b"#!/usr/bin/python\n", lines[0])
+        self.assertEqual(b"    unittest.main()\n", lines[-1])
         tmp.close()
 
 
+class TestPNGWriter(unittest.TestCase):
+
+    def test_writeRows(self):
+        f = io.BytesIO()
+        writer = PNGWriter(f, 2, 3)
+        writer.writeRows(b'\x01\x02\x03\x04' * 4)
+        writer.writeRows(b'\xff' * 8)
+        writer.close()
+        data = f.getvalue()
+        self.assertTrue(data.startswith(b'\x89PNG\r\n\x1a\n'))
+        self.assertEqual((2, 3), struct.unpack('>II', data[16:24]))
+        self.assertTrue(data.endswith(b'IEND\xaeB`\x82'))
+        # Concatenate image data chunks
+        compressed, pos = b'', 8
+        while pos < len(data):
+            length, tag = struct.unpack('>I4s', data[pos:pos + 8])
+            if tag == b'IDAT':
+                compressed += data[pos + 8:pos + 8 + length]
+            pos += length + 12
+        rows = zlib.decompress(compressed)
+        self.assertEqual((b'\x00' + b'\x01\x02\x03\x04' * 2) * 2 + b'\x00' + b'\xff' * 8, rows)
+
+
 if __name__ == '__main__':
     unittest.main()
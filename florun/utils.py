@@ -1,6 +1,8 @@
 #!/usr/bin/python
 # -*- coding: utf8 -*-
 import os
+import zlib
+import struct
 from io import StringIO
 import traceback
 
@@ -54,6 +56,47 @@ def traceback2str(tracebackobj):
     return tbinfo
 
 
+class PNGWriter(object):
+    """
+    Writes a RGBA image in PNG format progressively, rows after rows,
+    so that the whole image never has to be held in memory.
+    """
+
+    def __init__(self, fileobj, width, height):
+        """
+        @type fileobj : binary file object
+        @type width : int
+        @type height : int
+        """
+        self.fileobj = fileobj
+        self.stride  = width * 4
+        self._compressor = zlib.compressobj()
+        fileobj.write(b"\x89PNG\r\n\x1a\n")
+        # 8 bits per channel, RGBA, no interlace
+        self._chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0))
+
+    def _chunk(self, tag, data):
+        self.fileobj.write(struct.pack(">I", len(data)))
+        self.fileobj.write(tag + data)
+        self.fileobj.write(struct.pack(">I", zlib.crc32(tag + data) & 0xffffffff))
+
+    def writeRows(self, data):
+        """
+        @param data : consecutive rows of RGBA pixels, without padding
+        @type data : bytes
+        """
+        stride = self.stride
+        # Each row starts with its filter type (none)
+        rows = b"".join(b"\x00" + data[i:i + stride] for i in range(0, len(data), stride))
+        compressed = self._compressor.compress(rows)
+        if compressed:
+            self._chunk(b"IDAT", compressed)
+
+    def close(self):
+        self._chunk(b"IDAT", self._compressor.flush())
+        self._chunk(b"IEND", b"")
+
+
 def itersubclasses(cls, _seen=None):
     """
     itersubclasses(cls)